@@ -0,0 +1,86 @@
+"""
+═══════════════════════════════════════════════════════════════
+ANALYSIS STATE - One Decode and One Forward Pass per Upload
+═══════════════════════════════════════════════════════════════
+Everything derived from an uploaded X-ray, kept per browser
+session in st.session_state: the decoded display image, the
+preprocessed model input, the class probabilities and the fields
+derived from them. The X-ray tab, the report tab and the report
+generators all read this object, so an upload is decoded once for
+display, once for the model, and sent through the network at most
+once per session (and not at all when the shared inference cache
+already has its result).
+
+The model input is draft-decoded from the upload bytes with
+preprocessing.load_grayscale, exactly as the study, batch and HTTP
+paths do, so a cached result is the same whichever path ran first.
+═══════════════════════════════════════════════════════════════
+"""
+
+import io
+
+from inference_cache import content_hash
+from preprocessing import load_display_image, load_grayscale
+from stage_metrics import get_stage_metrics
+
+SESSION_KEY = 'xray_analysis'
+
+
+class XrayAnalysis:
+    """Decoded image, model input and prediction for one uploaded X-ray"""
+
+    def __init__(self, image_bytes, file_name=None, image_hash=None):
+        """
+        Args:
+            image_bytes (bytes): Raw upload
+            file_name (str): Original file name, for display and exports
+            image_hash (str): content_hash(image_bytes), if the caller already has it
+        """
+        self.file_name = file_name
+        self.image_hash = image_hash or content_hash(image_bytes)
+        metrics = get_stage_metrics()
+        with metrics.time('decode'):
+            self.display_image = load_display_image(io.BytesIO(image_bytes))
+        # Not resized from the display image: every path shares one cache key, so all must feed the same input
+        with metrics.time('preprocess'):
+            self.gray = load_grayscale(io.BytesIO(image_bytes))
+        self.prediction = None
+        self.confidence = None
+        self.normal_prob = None
+        self.pneumonia_prob = None
+
+    def set_result(self, result):
+        """Store a (prediction, confidence, normal_prob, pneumonia_prob) tuple"""
+        self.prediction, self.confidence, self.normal_prob, self.pneumonia_prob = result
+
+    @property
+    def result(self):
+        return self.prediction, self.confidence, self.normal_prob, self.pneumonia_prob
+
+    @property
+    def analyzed(self):
+        return self.prediction is not None
+
+
+def get_analysis(session_state, image_bytes, file_name, inference_cache, predict):
+    """
+    The session's XrayAnalysis for an upload, created on a new upload and
+    scored on first use; predict(gray) runs only on an inference cache miss.
+    """
+    with get_stage_metrics().time('upload'):
+        image_hash = content_hash(image_bytes)
+    analysis = session_state.get(SESSION_KEY)
+    if analysis is None or analysis.image_hash != image_hash:
+        analysis = XrayAnalysis(image_bytes, file_name, image_hash)
+        session_state[SESSION_KEY] = analysis
+
+    if not analysis.analyzed:
+        key = inference_cache.key_for_hash(image_hash)
+        result = inference_cache.get(key)
+        if result is None:
+            result = predict(analysis.gray)
+            # Failed predictions come back as all-None; they are retried on the next rerun
+            if result[0] is not None:
+                inference_cache.put(key, result)
+        analysis.set_result(result)
+    return analysis
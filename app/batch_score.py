@@ -0,0 +1,211 @@
+"""
+═══════════════════════════════════════════════════════════════
+BATCH SCORING CLI - Headless Chest X-Ray Classification
+═══════════════════════════════════════════════════════════════
+Scores every image under a directory (NORMAL/PNEUMONIA layout or
+flat) and streams the results to CSV or Parquet. Finished files are
+skipped on restart, so a crashed run resumes where it stopped.
+
+Usage:
+    python app/batch_score.py data/chest_xray/test results.csv
+    python app/batch_score.py /scans/backlog results.parquet --batch-size 64 --workers 8
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from engines import ENGINE_WEIGHTS, ENGINES, MODEL_PATH
+from inference import load_engine, normalize_gray_batch, predict_tensors
+from preprocessing import load_grayscale
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+LABEL_DIRS = {'NORMAL': 'Normal', 'PNEUMONIA': 'Pneumonia'}
+COLUMNS = ['path', 'label', 'prediction', 'confidence', 'normal_prob', 'pneumonia_prob', 'error']
+
+
+def iter_images(root_dir):
+    """Relative paths of images under root_dir, yielded while walking so the listing is never held in memory"""
+    for dir_path, dir_names, file_names in os.walk(root_dir):
+        dir_names.sort()
+        rel_dir = Path(dir_path).relative_to(root_dir)
+        for name in sorted(file_names):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield (rel_dir / name).as_posix()
+
+
+def find_images(root_dir):
+    """Relative paths of all images under root_dir, sorted for a stable order"""
+    return sorted(iter_images(root_dir))
+
+
+def label_for(rel_path):
+    """Ground-truth class from a NORMAL/PNEUMONIA parent folder, '' for flat layouts"""
+    return LABEL_DIRS.get(Path(rel_path).parent.name.upper(), '')
+
+
+def load_and_preprocess(path):
+    """Decode one image to resized uint8 grayscale; runs in the worker pool"""
+    try:
+        return load_grayscale(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_decoded_batches(input_dir, paths, batch_size, pool, decode=load_and_preprocess):
+    """Yield (paths, decoded) per batch while the pool decodes the next batch ahead; paths may be a generator"""
+    pending = None
+    for chunk in _batches(paths, batch_size):
+        futures = [pool.submit(decode, input_dir / p) for p in chunk]
+        if pending is not None:
+            yield pending[0], [f.result() for f in pending[1]]
+        pending = (chunk, futures)
+    if pending is not None:
+        yield pending[0], [f.result() for f in pending[1]]
+
+
+class ResultWriter:
+    """Append-only results file that doubles as the resume checkpoint"""
+
+    def __init__(self, output_path):
+        self.output_path = Path(output_path)
+        self.is_parquet = self.output_path.suffix.lower() == '.parquet'
+        if self.is_parquet:
+            # Parquet files cannot be appended to, so each checkpoint becomes a part file
+            self.output_path.mkdir(parents=True, exist_ok=True)
+
+    def _parts(self):
+        return sorted(self.output_path.glob('part-*.parquet'))
+
+    def done_paths(self):
+        """Paths already scored by a previous run"""
+        if self.is_parquet:
+            parts = self._parts()
+            if not parts:
+                return set()
+            return set(pd.concat(pd.read_parquet(p, columns=['path']) for p in parts)['path'])
+        if not self.output_path.exists() or self.output_path.stat().st_size == 0:
+            return set()
+        return set(pd.read_csv(self.output_path, usecols=['path'])['path'])
+
+    def write_rows(self, rows):
+        """Durably append a block of result rows"""
+        if not rows:
+            return
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        if self.is_parquet:
+            part_path = self.output_path / f'part-{len(self._parts()):05d}.parquet'
+            tmp_path = part_path.with_suffix('.tmp')
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, part_path)
+        else:
+            write_header = not self.output_path.exists() or self.output_path.stat().st_size == 0
+            with open(self.output_path, 'a', newline='') as f:
+                df.to_csv(f, header=write_header, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def score_directory(input_dir, output_path, model_path=None, batch_size=32,
+                    workers=None, checkpoint_every=1024, engine='fp32'):
+    """Score all images under input_dir, resuming from whatever output_path already holds"""
+    input_dir = Path(input_dir)
+    writer = ResultWriter(output_path)
+
+    done = writer.done_paths()
+    all_paths = find_images(input_dir)
+    pending = [p for p in all_paths if p not in done]
+    print(f"📁 Found {len(all_paths)} images in {input_dir}")
+    if done:
+        print(f"⏩ Resuming: {len(all_paths) - len(pending)} already scored")
+    if not pending:
+        print("✅ Nothing left to score")
+        return
+
+    model, device = load_engine(engine, model_path)
+    workers = workers or os.cpu_count()
+
+    buffer = []
+    scored = 0
+    labelled = correct = 0
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for chunk, decoded in iter_decoded_batches(input_dir, pending, batch_size, pool):
+                ok = [i for i, (gray, _) in enumerate(decoded) if gray is not None]
+                predictions = {}
+                if ok:
+                    img_tensor = normalize_gray_batch(np.stack([decoded[i][0] for i in ok]))
+                    predictions = dict(zip(ok, predict_tensors(img_tensor, model, device)))
+
+                for i, rel_path in enumerate(chunk):
+                    label = label_for(rel_path)
+                    if i in predictions:
+                        prediction, confidence, normal_prob, pneumonia_prob = predictions[i]
+                        error = ''
+                        if label:
+                            labelled += 1
+                            correct += prediction == label
+                    else:
+                        prediction = confidence = normal_prob = pneumonia_prob = None
+                        error = decoded[i][1]
+                    buffer.append([rel_path, label, prediction, confidence,
+                                   normal_prob, pneumonia_prob, error])
+
+                scored += len(chunk)
+                if len(buffer) >= checkpoint_every:
+                    writer.write_rows(buffer)
+                    buffer = []
+                    rate = scored / (time.time() - start_time)
+                    print(f"💾 Checkpoint: {scored}/{len(pending)} scored ({rate:.1f} img/s)")
+    finally:
+        # Keep whatever finished before an interruption so the next run skips it
+        writer.write_rows(buffer)
+
+    elapsed = time.time() - start_time
+    print(f"✅ Scored {scored} images in {elapsed:.1f}s ({scored / elapsed:.1f} img/s)")
+    if labelled:
+        print(f"🎯 Accuracy on labelled images: {100 * correct / labelled:.2f}%")
+    print(f"📄 Results written to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a directory of chest X-rays with the pneumonia model")
+    parser.add_argument('input_dir', help="Directory of images (NORMAL/PNEUMONIA subfolders or flat)")
+    parser.add_argument('output', help="Results file: .csv, or .parquet for a directory of part files")
+    parser.add_argument('--engine', choices=ENGINES, default='fp32', help="Inference engine")
+    parser.add_argument('--model-path', help="Weights for the engine (default: models/ file for --engine)")
+    parser.add_argument('--batch-size', type=int, default=32, help="Images per forward pass")
+    parser.add_argument('--workers', type=int, default=None, help="Decode threads (default: CPU count)")
+    parser.add_argument('--checkpoint-every', type=int, default=1024,
+                        help="Write results to disk every N images")
+    args = parser.parse_args()
+
+    if args.model_path is None and ENGINE_WEIGHTS[args.engine] == MODEL_PATH:
+        from download_model import download_model
+        if not download_model():
+            raise SystemExit(1)
+
+    score_directory(args.input_dir, args.output, args.model_path, args.batch_size,
+                    args.workers, args.checkpoint_every, args.engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+═══════════════════════════════════════════════════════════════
+BULK REPORTS - PDF Report Packs for a Patient Worklist
+═══════════════════════════════════════════════════════════════
+Builds the app's PDF report (medical_report.generate_pdf_report,
+unchanged layout) for every patient in a CSV or Parquet worklist.
+X-rays listed in an optional image_path column are scored in
+batches in this process; the PDFs are built in a process pool and
+written to a directory or a single zip as they complete. The
+worklist is read in chunks and only a bounded number of reports
+is in flight, so memory stays flat however long the list is.
+
+Rows that cannot be reported (a blank name or gender, an age or
+symptom_days that is missing or not a plausible number) are skipped
+with a warning and listed in the summary, so one bad row never
+stops the rest of the shift pack.
+
+An output path ending in .pdf instead produces one combined ward
+report: medical_report.ReportBuilder lays out every patient in a
+single pass with shared styles, each starting on a new page.
+
+Worklist columns:
+    patient_name, age, gender                        required
+    has_fever, has_cough, has_breathing_difficulty,
+    is_smoker, has_chronic_condition, symptom_days   default False / 0
+    image_path                                       optional, relative to --image-root
+
+Usage:
+    python app/bulk_reports.py worklist.csv reports/
+    python app/bulk_reports.py worklist.parquet shift_reports.zip --workers 8
+    python app/bulk_reports.py worklist.csv ward_report.pdf
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from engines import ENGINE_WEIGHTS, ENGINES, MODEL_PATH
+from risk_engine import get_risk_engine
+
+REQUIRED_COLUMNS = ['patient_name', 'age', 'gender']
+FLAG_COLUMNS = ['has_fever', 'has_cough', 'has_breathing_difficulty', 'is_smoker', 'has_chronic_condition']
+TRUE_STRINGS = {'1', 'true', 't', 'yes', 'y'}
+
+
+def iter_worklist(path, chunk_size=256):
+    """Yield the worklist as DataFrame chunks without loading all of it"""
+    path = Path(path)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype={'patient_name': str, 'image_path': str})
+
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    return bool(value) and not pd.isna(value)
+
+
+def report_name(row_number, patient_name):
+    """File name of one report, e.g. 00042_Jane_Doe.pdf; the row number keeps names unique"""
+    safe_name = re.sub(r'[^A-Za-z0-9]+', '_', str(patient_name)).strip('_') or 'patient'
+    return f"{row_number:05d}_{safe_name}.pdf"
+
+
+def report_args(record):
+    """Positional arguments of generate_pdf_report / ReportBuilder.add_patient for a record"""
+    flags = [record[c] for c in FLAG_COLUMNS]
+    risk_engine = get_risk_engine()
+    risk_score = risk_engine.calculate_clinical_risk(record['age'], *flags, record['symptom_days'])
+    risk_category, _ = risk_engine.get_risk_category(risk_score)
+    return (record['patient_name'], record['age'], record['gender'], *flags, record['symptom_days'],
+            risk_score, risk_category, record['prediction'], record['confidence'])
+
+
+def build_report(job):
+    """Worker: (file name, PDF bytes) for one patient record"""
+    from medical_report import generate_pdf_report
+
+    name, record = job
+    return name, generate_pdf_report(*report_args(record)).getvalue()
+
+
+class ReportSink:
+    """Writes finished reports into a directory, or into one zip if the path ends in .zip"""
+
+    def __init__(self, output_path):
+        self.output_path = Path(output_path)
+        self._zip = None
+        if self.output_path.suffix == '.zip':
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self._zip = zipfile.ZipFile(self.output_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            self.output_path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name, pdf_bytes):
+        if self._zip is not None:
+            self._zip.writestr(name, pdf_bytes)
+        else:
+            tmp_path = self.output_path / f"{name}.tmp"
+            tmp_path.write_bytes(pdf_bytes)
+            os.replace(tmp_path, self.output_path / name)
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+
+class ImageScorer:
+    """Loads the inference engine on first use and scores worklist X-rays in batches"""
+
+    def __init__(self, engine='fp32', model_path=None, batch_size=32):
+        self.engine = engine
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self._model = None
+
+    def _load(self):
+        from inference import load_engine
+        if self.model_path is None and ENGINE_WEIGHTS[self.engine] == MODEL_PATH:
+            from download_model import download_model
+            if not download_model():
+                raise SystemExit(1)
+        self._model, self._device = load_engine(self.engine, self.model_path)
+
+    def score(self, paths):
+        """(prediction, confidence) per path; (None, None) where decoding fails"""
+        import numpy as np
+        from inference import normalize_gray_batch, predict_tensors
+        from preprocessing import load_grayscale
+
+        if self._model is None:
+            self._load()
+        results = []
+        for start in range(0, len(paths), self.batch_size):
+            grays, ok = [], []
+            for path in paths[start:start + self.batch_size]:
+                try:
+                    grays.append(load_grayscale(path))
+                    ok.append(True)
+                except Exception as e:
+                    print(f"⚠️ Could not read {path}: {e}")
+                    ok.append(False)
+            scored = iter(predict_tensors(normalize_gray_batch(np.stack(grays)), self._model, self._device)
+                          if grays else [])
+            for good in ok:
+                results.append(next(scored)[:2] if good else (None, None))
+        return results
+
+
+def _whole_number(row, column, low, high, default=None):
+    value = row.get(column, default)
+    if isinstance(value, str):
+        value = value.strip() or None
+    if value is None or pd.isna(value):
+        if default is None:
+            raise ValueError(f"{column} is blank")
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{column} {value!r} is not a number") from None
+    if not number.is_integer() or not low <= number <= high:
+        raise ValueError(f"{column} {number:g} is not a whole number from {low} to {high}")
+    return int(number)
+
+
+def _text(row, column):
+    value = row.get(column)
+    if value is None or (not isinstance(value, str) and pd.isna(value)) or not str(value).strip():
+        raise ValueError(f"{column} is blank")
+    return str(value).strip()
+
+
+def parse_record(row, image_root):
+    """Validated report record for one worklist row; raises ValueError naming the bad field"""
+    record = {
+        'patient_name': _text(row, 'patient_name'),
+        'age': _whole_number(row, 'age', 0, 130),
+        'gender': _text(row, 'gender'),
+    }
+    for c in FLAG_COLUMNS:
+        record[c] = _as_bool(row.get(c, False))
+    record['symptom_days'] = _whole_number(row, 'symptom_days', 0, 3650, default=0)
+    image_path = row.get('image_path')
+    record['image_path'] = str(image_root / image_path) if isinstance(image_path, str) and image_path else None
+    record['prediction'] = record['confidence'] = None
+    return record
+
+
+def prepare_jobs(chunk, first_row, image_root, scorer, skipped):
+    """
+    Turn a worklist chunk into (file name, record) jobs, scoring any X-rays first.
+    Invalid rows are left out and appended to skipped as (row number, reason).
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"worklist is missing required columns: {', '.join(missing)}")
+
+    records = []
+    for row_number, row in enumerate(chunk.to_dict('records'), first_row):
+        try:
+            records.append((row_number, parse_record(row, image_root)))
+        except ValueError as e:
+            print(f"⚠️ Skipping worklist row {row_number}: {e}")
+            skipped.append((row_number, str(e)))
+
+    with_images = [r for _, r in records if r['image_path']]
+    if with_images:
+        for record, (prediction, confidence) in zip(with_images, scorer.score([r['image_path'] for r in with_images])):
+            record['prediction'], record['confidence'] = prediction, confidence
+
+    return [(report_name(row_number, r['patient_name']), r) for row_number, r in records]
+
+
+def generate_combined_report(worklist_path, output_path, image_root=None, chunk_size=256,
+                             engine='fp32', model_path=None):
+    """Write every valid worklist row into one PDF, one section per patient; returns (count, skipped rows)"""
+    from medical_report import ReportBuilder
+
+    image_root = Path(image_root) if image_root else Path(worklist_path).parent
+    scorer = ImageScorer(engine, model_path)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+
+    written = 0
+    skipped = []
+    row_number = 1
+    with open(tmp_path, 'wb') as sink:
+        with ReportBuilder(sink) as builder:
+            for chunk in iter_worklist(worklist_path, chunk_size):
+                for _, record in prepare_jobs(chunk, row_number, image_root, scorer, skipped):
+                    builder.add_patient(*report_args(record))
+                    written += 1
+                row_number += len(chunk)
+    os.replace(tmp_path, output_path)
+    return written, skipped
+
+
+def generate_reports(worklist_path, output_path, image_root=None, workers=None, chunk_size=256,
+                     engine='fp32', model_path=None):
+    """Build one PDF per valid worklist row into a directory or zip; returns (count, skipped rows)"""
+    if Path(output_path).suffix == '.pdf':
+        return generate_combined_report(worklist_path, output_path, image_root, chunk_size, engine, model_path)
+
+    image_root = Path(image_root) if image_root else Path(worklist_path).parent
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = 2 * workers
+    scorer = ImageScorer(engine, model_path)
+    sink = ReportSink(output_path)
+
+    written = 0
+    skipped = []
+    pending = deque()
+    try:
+        # Spawned, not forked: the parent may hold torch's thread pools by the time workers start
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            row_number = 1
+            for chunk in iter_worklist(worklist_path, chunk_size):
+                jobs = prepare_jobs(chunk, row_number, image_root, scorer, skipped)
+                row_number += len(chunk)
+                for job in jobs:
+                    # Bounded in-flight work: write the oldest report before queueing more
+                    while len(pending) >= max_in_flight:
+                        sink.write(*pending.popleft().result())
+                        written += 1
+                    pending.append(pool.submit(build_report, job))
+            while pending:
+                sink.write(*pending.popleft().result())
+                written += 1
+    finally:
+        sink.close()
+    return written, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build PDF reports for every patient in a worklist")
+    parser.add_argument('worklist', help="CSV or Parquet file of patient records")
+    parser.add_argument('output', help="Output directory, a .zip file, or a .pdf for one combined report")
+    parser.add_argument('--image-root', help="Base directory for image_path (default: the worklist's folder)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Report processes (default: CPU count; unused for a combined .pdf)")
+    parser.add_argument('--chunk-size', type=int, default=256, help="Worklist rows read at a time")
+    parser.add_argument('--engine', choices=ENGINES, default='fp32', help="Inference engine for image_path rows")
+    parser.add_argument('--model-path', help="Weights for the engine (default: models/ file for --engine)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count, skipped = generate_reports(args.worklist, args.output, args.image_root, args.workers,
+                                      args.chunk_size, args.engine, args.model_path)
+    elapsed = time.perf_counter() - start
+    print(f"📄 {count} reports written to {args.output} in {elapsed:.1f} s "
+          f"({count / elapsed if elapsed else 0:.1f} reports/s)")
+    if skipped:
+        print(f"⚠️ {len(skipped)} worklist rows skipped:")
+        for row_number, reason in skipped:
+            print(f"   - row {row_number}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+═══════════════════════════════════════════════════════════════
+CHART CACHE - Pre-Rendered Risk Gauge and Symptom Charts
+═══════════════════════════════════════════════════════════════
+The report charts only come in a small, fixed set of variants:
+101 integer risk scores x 3 categories for the gauge and 2^5
+symptom combinations for the symptom profile. Each variant is
+rendered with matplotlib once and its PNG bytes are served from
+memory afterwards. Pre-bake every variant to disk and point
+PNEUMONIA_CHART_DIR at it, and matplotlib is only imported for
+the fractional scores that rules with fractional points give:
+    python app/chart_cache.py --output models/charts
+
+Disk assets live in a sub-folder named after a digest of
+medical_report.py, so editing the chart code never serves stale
+images.
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import os
+import threading
+import time
+from pathlib import Path
+
+from inference_cache import file_digest
+
+RISK_CATEGORIES = ['LOW', 'MEDIUM', 'HIGH']
+SYMPTOM_COUNT = 5
+CHART_SOURCE = Path(__file__).resolve().with_name('medical_report.py')
+
+
+def symptom_mask(has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition):
+    """Bitmask of the five symptom flags, fever in the lowest bit"""
+    flags = [has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]
+    return sum(1 << i for i, flag in enumerate(flags) if flag)
+
+
+class ChartCache:
+    """Rendered chart PNGs held in memory, with an optional pre-baked tier on disk"""
+
+    def __init__(self, disk_dir=None):
+        """
+        Args:
+            disk_dir (str): Optional directory of pre-baked assets (see prebake())
+        """
+        self.disk_dir = None
+        if disk_dir:
+            self.disk_dir = os.path.join(disk_dir, file_digest(CHART_SOURCE)[:16])
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._entries = {}
+        # pyplot keeps global state, so renders from concurrent sessions must not interleave
+        self._render_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    def _get(self, name, render):
+        png = self._entries.get(name)
+        if png is not None:
+            self.hits += 1
+            return png
+
+        with self._render_lock:
+            png = self._entries.get(name)
+            if png is not None:
+                self.hits += 1
+                return png
+
+            path = os.path.join(self.disk_dir, name) if self.disk_dir else None
+            if path and os.path.exists(path):
+                with open(path, 'rb') as f:
+                    png = f.read()
+                self.disk_hits += 1
+            else:
+                png = render().getvalue()
+                self.renders += 1
+                if path:
+                    tmp_path = path + '.tmp'
+                    with open(tmp_path, 'wb') as f:
+                        f.write(png)
+                    os.replace(tmp_path, path)
+            self._entries[name] = png
+            return png
+
+    def risk_gauge(self, risk_score, risk_category):
+        """PNG bytes of create_risk_gauge_chart(risk_score, risk_category)"""
+        def render():
+            from medical_report import create_risk_gauge_chart
+            return create_risk_gauge_chart(risk_score, risk_category)
+        # Keyed on the exact score: rules with fractional points give scores like 25.5
+        return self._get(f"risk_gauge_{risk_score:03g}_{risk_category}.png", render)
+
+    def symptoms(self, has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition):
+        """PNG bytes of create_symptoms_chart for the given flags"""
+        flags = [bool(has_fever), bool(has_cough), bool(has_breathing_difficulty),
+                 bool(is_smoker), bool(has_chronic_condition)]
+
+        def render():
+            from medical_report import create_symptoms_chart
+            return create_symptoms_chart(*flags)
+        return self._get(f"symptoms_{symptom_mask(*flags):02d}.png", render)
+
+    def prebake(self):
+        """Render every gauge and symptom variant; returns the number of charts"""
+        for risk_score in range(101):
+            for risk_category in RISK_CATEGORIES:
+                self.risk_gauge(risk_score, risk_category)
+        for mask in range(1 << SYMPTOM_COUNT):
+            self.symptoms(*[bool(mask >> i & 1) for i in range(SYMPTOM_COUNT)])
+        return 101 * len(RISK_CATEGORIES) + (1 << SYMPTOM_COUNT)
+
+    def stats(self):
+        """Return hit/render counters and current size"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'renders': self.renders,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_chart_cache():
+    """Process-wide cache, backed by PNEUMONIA_CHART_DIR when it is set"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ChartCache(os.environ.get('PNEUMONIA_CHART_DIR'))
+        return _default_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render every report chart variant to disk")
+    parser.add_argument('--output', default='models/charts', help="Asset directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    cache = ChartCache(args.output)
+    start = time.perf_counter()
+    count = cache.prebake()
+    elapsed = time.perf_counter() - start
+    print(f"💾 {count} charts in {cache.disk_dir} ({cache.renders} rendered, {cache.disk_hits} already on disk) "
+          f"in {elapsed:.1f} s")
+    print(f"   Serve them with PNEUMONIA_CHART_DIR={args.output}")
+
+    start = time.perf_counter()
+    cache.risk_gauge(42, 'MEDIUM')
+    print(f"⚡ Cached lookup: {1e6 * (time.perf_counter() - start):.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
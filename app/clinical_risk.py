@@ -0,0 +1,133 @@
+"""
+═══════════════════════════════════════════════════════════════
+CLINICAL RISK - Rule-Based Pneumonia Risk Score
+═══════════════════════════════════════════════════════════════
+Scores patient demographics, symptoms and history on a 0-100
+scale and maps the score to a LOW / MEDIUM / HIGH category. Shared
+by the Streamlit app and the bulk report tools.
+
+The *_batch functions apply the same rules to whole cohorts
+(NumPy arrays or DataFrame columns) in a few vectorized passes.
+Run this file to check them against the scalar rules and time both:
+    python app/clinical_risk.py --rows 1000000
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def calculate_clinical_risk(age, has_fever, has_cough, has_breathing_difficulty, 
+                           is_smoker, has_chronic_condition, symptom_days):
+    risk_score = 0
+    if age > 65: risk_score += 25
+    elif age > 45: risk_score += 15
+    elif age < 5: risk_score += 20
+    if has_fever: risk_score += 15
+    if has_cough: risk_score += 10
+    if has_breathing_difficulty: risk_score += 20
+    if symptom_days > 7: risk_score += 15
+    elif symptom_days > 3: risk_score += 10
+    if is_smoker: risk_score += 10
+    if has_chronic_condition: risk_score += 15
+    return min(risk_score, 100)
+
+def get_risk_category(risk_score):
+    if risk_score < 30: return "LOW", "🟢"
+    elif risk_score < 60: return "MEDIUM", "🟡"
+    else: return "HIGH", "🔴"
+
+# ═══════════════════════════════════════════════════════════════
+# COHORT SCORING
+# ═══════════════════════════════════════════════════════════════
+
+RISK_FACTOR_COLUMNS = ['age', 'has_fever', 'has_cough', 'has_breathing_difficulty',
+                       'is_smoker', 'has_chronic_condition', 'symptom_days']
+RISK_CATEGORIES = np.array(["LOW", "MEDIUM", "HIGH"])
+RISK_ICONS = np.array(["🟢", "🟡", "🔴"])
+CATEGORY_CUTOFFS = [30, 60]
+
+
+def calculate_clinical_risk_batch(age, has_fever, has_cough, has_breathing_difficulty,
+                                  is_smoker, has_chronic_condition, symptom_days):
+    """calculate_clinical_risk over arrays: one vectorized pass, same scores as the scalar rules"""
+    age = np.asarray(age)
+    symptom_days = np.asarray(symptom_days)
+    risk_score = np.select([age > 65, age > 45, age < 5], [25, 15, 20], 0)
+    risk_score += 15 * np.asarray(has_fever, dtype=bool)
+    risk_score += 10 * np.asarray(has_cough, dtype=bool)
+    risk_score += 20 * np.asarray(has_breathing_difficulty, dtype=bool)
+    risk_score += np.select([symptom_days > 7, symptom_days > 3], [15, 10], 0)
+    risk_score += 10 * np.asarray(is_smoker, dtype=bool)
+    risk_score += 15 * np.asarray(has_chronic_condition, dtype=bool)
+    return np.minimum(risk_score, 100)
+
+
+def get_risk_category_batch(risk_scores):
+    """get_risk_category over an array of scores; returns (categories, icons) arrays"""
+    index = np.searchsorted(CATEGORY_CUTOFFS, np.asarray(risk_scores), side='right')
+    return RISK_CATEGORIES[index], RISK_ICONS[index]
+
+
+def score_cohort(cohort):
+    """Copy of a DataFrame with RISK_FACTOR_COLUMNS plus risk_score and risk_category columns"""
+    risk_scores = calculate_clinical_risk_batch(*[cohort[c].to_numpy() for c in RISK_FACTOR_COLUMNS])
+    categories, _ = get_risk_category_batch(risk_scores)
+    return cohort.assign(risk_score=risk_scores, risk_category=categories)
+
+
+def random_cohort(size, seed=0):
+    """Dict of random risk-factor arrays covering every age and duration branch"""
+    rng = np.random.default_rng(seed)
+    cohort = {'age': rng.integers(0, 111, size), 'symptom_days': rng.integers(0, 31, size)}
+    for column in RISK_FACTOR_COLUMNS[1:-1]:
+        cohort[column] = rng.random(size) < 0.5
+    return cohort
+
+
+def check_equivalence():
+    """Compare batch and scalar results on every age x flag x duration combination; returns the row count"""
+    grid = np.array(np.meshgrid(np.arange(0, 111), *[[False, True]] * 5, np.arange(0, 31), indexing='ij'))
+    columns = [axis.ravel() for axis in grid.reshape(len(RISK_FACTOR_COLUMNS), -1)]
+    columns[1:6] = [c.astype(bool) for c in columns[1:6]]
+
+    batch_scores = calculate_clinical_risk_batch(*columns)
+    batch_categories, batch_icons = get_risk_category_batch(batch_scores)
+    for row, (score, category, icon) in enumerate(zip(batch_scores.tolist(), batch_categories.tolist(),
+                                                      batch_icons.tolist())):
+        args = [c[row].item() for c in columns]
+        expected_score = calculate_clinical_risk(*args)
+        if score != expected_score or (category, icon) != get_risk_category(expected_score):
+            raise AssertionError(f"batch scoring differs for {dict(zip(RISK_FACTOR_COLUMNS, args))}: "
+                                 f"{score} {category} vs {expected_score} {get_risk_category(expected_score)}")
+    return len(batch_scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark vectorized cohort risk scoring")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Cohort size for the throughput benchmark")
+    parser.add_argument('--scalar-rows', type=int, default=100_000, help="Rows timed with the scalar functions")
+    args = parser.parse_args()
+
+    print(f"✅ Batch scoring matches the scalar rules on all {check_equivalence():,} combinations")
+
+    cohort = random_cohort(args.rows)
+    start = time.perf_counter()
+    risk_scores = calculate_clinical_risk_batch(*[cohort[c] for c in RISK_FACTOR_COLUMNS])
+    get_risk_category_batch(risk_scores)
+    batch_rate = args.rows / (time.perf_counter() - start)
+
+    rows = [[cohort[c][i].item() for c in RISK_FACTOR_COLUMNS] for i in range(min(args.scalar_rows, args.rows))]
+    start = time.perf_counter()
+    for row in rows:
+        get_risk_category(calculate_clinical_risk(*row))
+    scalar_rate = len(rows) / (time.perf_counter() - start)
+
+    print(f"🚀 Scalar: {scalar_rate:,.0f} rows/s | batch: {batch_rate:,.0f} rows/s "
+          f"({batch_rate / scalar_rate:.0f}x) on {args.rows:,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+═══════════════════════════════════════════════════════════════
+ENGINES - Inference Engine Names and Their Weights Files
+═══════════════════════════════════════════════════════════════
+The one list of inference engines. It has no heavy imports, so
+CLIs can offer --engine choices (and the ONNX replica or report
+workers can start) without importing torch; inference.load_engine
+does the actual loading.
+
+model_version() names the engine and its weights together: bf16,
+torchscript and fp32 share a weights file but not their outputs,
+so caches and exported rows must tell them apart.
+═══════════════════════════════════════════════════════════════
+"""
+
+from inference_cache import file_digest
+
+MODEL_PATH = 'models/best_model.pth'
+QUANTIZED_MODEL_PATH = 'models/best_model_int8.pth'
+ONNX_MODEL_PATH = 'models/best_model.onnx'
+
+# Inference engines and the weights file each one loads by default
+ENGINE_WEIGHTS = {
+    'fp32': MODEL_PATH,
+    'int8': QUANTIZED_MODEL_PATH,
+    'torchscript': MODEL_PATH,
+    'onnx': ONNX_MODEL_PATH,
+    'bf16': MODEL_PATH,
+}
+ENGINES = list(ENGINE_WEIGHTS)
+
+
+def model_version(engine, model_path=None):
+    """'<engine>-<weights digest>' identifying the predictions an engine makes"""
+    return f"{engine}-{file_digest(model_path or ENGINE_WEIGHTS[engine])[:16]}"
@@ -0,0 +1,163 @@
+"""
+═══════════════════════════════════════════════════════════════
+INFERENCE CORE - Model Architecture, Preprocessing & Prediction
+═══════════════════════════════════════════════════════════════
+Streamlit-free building blocks shared by the web app, the batch
+scoring CLI and any other entry point that needs the classifier.
+═══════════════════════════════════════════════════════════════
+"""
+
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torchvision import transforms, models
+
+from engines import ENGINE_WEIGHTS, MODEL_PATH
+from preprocessing import NORM_BIAS, NORM_SCALE, to_grayscale
+from stage_metrics import get_stage_metrics
+
+CLASS_NAMES = ['Normal', 'Pneumonia']
+
+# Compute precisions for training and eager inference; None keeps everything fp32
+AUTOCAST_DTYPES = {
+    'fp32': None,
+    'bf16': torch.bfloat16,
+}
+
+# Reference torchvision pipeline; the inference paths use the equivalent grayscale
+# batch preprocessing below (see preprocessing.py)
+transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+_NORM_SCALE = torch.from_numpy(NORM_SCALE)
+_NORM_BIAS = torch.from_numpy(NORM_BIAS)
+
+
+def normalize_gray_batch(gray_batch):
+    """(N, 224, 224) uint8 grayscale -> normalized (N, 3, 224, 224) tensor in one fused op"""
+    # A copy, not from_numpy: arrays from np.asarray(PIL image) are read-only, and one 224x224 copy is cheap
+    gray = torch.tensor(np.asarray(gray_batch, dtype=np.uint8)).unsqueeze(1)
+    return torch.addcmul(_NORM_BIAS, gray, _NORM_SCALE)
+
+
+def build_model():
+    """ResNet-18 with the two-class dropout head used in training"""
+    model = models.resnet18(weights=None)
+    num_features = model.fc.in_features
+    model.fc = nn.Sequential(
+        nn.Dropout(0.5),
+        nn.Linear(num_features, 128),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(128, 2)
+    )
+    return model
+
+
+def load_weights(model_path=MODEL_PATH, device=None):
+    """Build the model, load trained weights and switch to eval mode"""
+    device = device or torch.device('cpu')
+    model = build_model()
+    state = torch.load(model_path, map_location=device, weights_only=True)
+    # Also accept a trainer.py checkpoint (last.pt) and weights saved from a DistributedDataParallel wrapper
+    state = state.get('model', state)
+    model.load_state_dict({k.removeprefix('module.'): v for k, v in state.items()})
+    model.to(device)
+    model.eval()
+    return model, device
+
+
+def autocast(device, precision='fp32'):
+    """Autocast context for a precision in AUTOCAST_DTYPES; a no-op for fp32"""
+    if precision not in AUTOCAST_DTYPES:
+        raise ValueError(f"Unknown precision '{precision}', expected one of: {', '.join(AUTOCAST_DTYPES)}")
+    dtype = AUTOCAST_DTYPES[precision]
+    return torch.autocast(device.type, dtype=dtype, enabled=dtype is not None)
+
+
+def load_engine(engine='fp32', model_path=None):
+    """Load the model for an inference engine: 'fp32' eager, 'bf16' autocast, 'int8', 'torchscript' or 'onnx'"""
+    if engine not in ENGINE_WEIGHTS:
+        raise ValueError(f"Unknown inference engine '{engine}', expected one of: {', '.join(ENGINE_WEIGHTS)}")
+    model_path = model_path or ENGINE_WEIGHTS[engine]
+    if engine == 'int8':
+        # Imported lazily so the default engine never touches the quantization stack
+        from quantization import load_quantized_model
+        return load_quantized_model(model_path)
+    if engine == 'torchscript':
+        from torchscript_engine import load_torchscript_model
+        return load_torchscript_model(model_path)
+    if engine == 'onnx':
+        from onnx_engine import OnnxPredictor
+        threads = int(os.environ.get('PNEUMONIA_ORT_THREADS', 0))
+        return OnnxRuntimeModel(OnnxPredictor(model_path, intra_op_threads=threads)), torch.device('cpu')
+    if engine == 'bf16':
+        model, device = load_weights(model_path)
+        return AutocastModel(model, device, 'bf16'), device
+    return load_weights(model_path)
+
+
+class AutocastModel:
+    """Callable with the torch model interface that runs the forward pass under autocast"""
+
+    def __init__(self, model, device, precision):
+        self.model = model
+        self.device = device
+        self.precision = precision
+
+    def __call__(self, img_tensor):
+        with autocast(self.device, self.precision):
+            outputs = self.model(img_tensor)
+        # Softmax and confidence stay in fp32 so results compare directly with the fp32 engine
+        return outputs.float()
+
+
+class OnnxRuntimeModel:
+    """Callable with the torch model interface, backed by an ONNX Runtime session"""
+
+    def __init__(self, predictor):
+        self.predictor = predictor
+
+    def __call__(self, img_tensor):
+        return torch.from_numpy(self.predictor.run(img_tensor.cpu().numpy()))
+
+
+def warmup(model, device, batch_size=8, runs=2):
+    """Run throwaway forward passes so the first real request skips one-off setup costs"""
+    example = torch.zeros(batch_size, 3, 224, 224, device=device)
+    with torch.no_grad():
+        for _ in range(runs):
+            model(example)
+
+
+def predict_tensors(img_tensor, model, device):
+    """Run one forward pass over a preprocessed (N, 3, 224, 224) batch"""
+    metrics = get_stage_metrics()
+    with torch.no_grad():
+        with metrics.time('forward'):
+            outputs = model(img_tensor.to(device))
+        with metrics.time('postprocess'):
+            probabilities = torch.softmax(outputs, dim=1)
+            confidence, predicted = torch.max(probabilities, 1)
+
+            results = []
+            for (normal_p, pneumonia_p), conf, pred in zip(probabilities.tolist(),
+                                                           confidence.tolist(),
+                                                           predicted.tolist()):
+                results.append((CLASS_NAMES[pred], conf * 100, normal_p * 100, pneumonia_p * 100))
+    return results
+
+
+def predict_batch(images, model, device, batch_size=32):
+    """Classify a list of PIL images, one forward pass per chunk of batch_size"""
+    results = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        img_tensor = normalize_gray_batch(np.stack([to_grayscale(image) for image in chunk]))
+        results.extend(predict_tensors(img_tensor, model, device))
+    return results
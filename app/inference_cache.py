@@ -0,0 +1,149 @@
+"""
+═══════════════════════════════════════════════════════════════
+INFERENCE CACHE - Content-Addressed Prediction Results
+═══════════════════════════════════════════════════════════════
+Prediction results keyed by a hash of the uploaded image bytes plus
+the model weights digest, so an X-ray goes through the network at
+most once per model version no matter how often Streamlit reruns.
+═══════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def content_hash(data):
+    """Return the SHA-256 hex digest of raw bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InferenceCache:
+    """Bounded LRU cache of prediction tuples with an optional on-disk tier"""
+
+    def __init__(self, model_version, max_entries=256, disk_dir=None):
+        """
+        Args:
+            model_version (str): Engine and weights the results belong to (see engines.model_version)
+            max_entries (int): Maximum number of results kept in memory
+            disk_dir (str): Optional directory for results that survive restarts
+        """
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.disk_dir = None
+        if disk_dir:
+            # One sub-folder per model version so new weights never see stale results
+            self.disk_dir = os.path.join(disk_dir, model_version)
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def make_key(self, image_bytes):
+        """Cache key for an uploaded image under the current model version"""
+        return self.key_for_hash(content_hash(image_bytes))
+
+    def key_for_hash(self, image_hash):
+        """Cache key for an image whose content_hash is already known"""
+        return f"{self.model_version}:{image_hash}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key.split(':', 1)[1] + '.json')
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for a key, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self.disk_dir:
+                try:
+                    with open(self._disk_path(key), 'r') as f:
+                        result = tuple(json.load(f))
+                except (OSError, ValueError):
+                    result = None
+                if result is not None:
+                    self._remember(key, result)
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        """Store a prediction tuple in memory and, if enabled, on disk"""
+        with self._lock:
+            self._remember(key, result)
+            if self.disk_dir:
+                tmp_path = self._disk_path(key) + '.tmp'
+                try:
+                    with open(tmp_path, 'w') as f:
+                        json.dump(list(result), f)
+                    os.replace(tmp_path, self._disk_path(key))
+                except OSError:
+                    # The disk tier is best effort; memory still holds the result
+                    pass
+
+    def get_or_compute(self, image_bytes, compute):
+        """Return the cached result for image_bytes, calling compute() on a miss"""
+        key = self.make_key(image_bytes)
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            # Failed predictions come back as all-None and are not cached
+            if result is not None and result[0] is not None:
+                self.put(key, result)
+        return result
+
+    def get_or_compute_many(self, image_bytes_list, compute_batch):
+        """Cached results for several uploads; compute_batch(indices) scores all misses at once"""
+        keys = [self.make_key(data) for data in image_bytes_list]
+        results = [self.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            for i, result in zip(missing, compute_batch(missing)):
+                results[i] = result
+                if result is not None and result[0] is not None:
+                    self.put(keys[i], result)
+        return results
+
+    def clear(self):
+        """Drop all in-memory entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,305 @@
+"""
+═══════════════════════════════════════════════════════════════
+INFERENCE SERVER - HTTP Prediction Service with Micro-Batching
+═══════════════════════════════════════════════════════════════
+Standard-library HTTP service around the pneumonia model. Requests
+are queued and coalesced into micro-batches bounded by a maximum
+batch size and a maximum wait, trading a little latency for much
+higher throughput under load.
+
+Endpoints:
+    POST /predict   raw image bytes -> prediction JSON
+    GET  /metrics   Prometheus-style queue, batch and per-stage latency metrics
+    GET  /health    liveness check
+
+With --engine onnx the service runs on ONNX Runtime and never
+imports torch, for lightweight serving replicas.
+
+Usage:
+    python app/inference_server.py --port 8080 --max-batch-size 16 --max-wait-ms 10
+    curl --data-binary @xray.jpeg http://localhost:8080/predict
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import io
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from engines import ENGINE_WEIGHTS, ENGINES, MODEL_PATH
+from stage_metrics import get_stage_metrics
+
+
+class MicroBatcher:
+    """Coalesces single-image requests into batched forward passes on one worker thread"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=10):
+        """
+        Args:
+            predict_fn (callable): Maps a list of preprocessed images to prediction tuples
+            max_batch_size (int): Largest batch sent through the network
+            max_wait_ms (float): Longest time the first queued request waits for company
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.requests_total = 0
+        self.batches_total = 0
+        self.batch_size_counts = {}
+        self.inference_seconds_total = 0.0
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, img_input):
+        """Queue one preprocessed image; returns a Future of the prediction tuple"""
+        future = Future()
+        self._queue.put((img_input, future))
+        return future
+
+    def predict(self, img_input, timeout=None):
+        """Blocking helper returning (prediction, confidence, normal_prob, pneumonia_prob)"""
+        return self.submit(img_input).result(timeout)
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            inputs, futures = zip(*batch)
+            start = time.perf_counter()
+            try:
+                results = self.predict_fn(list(inputs))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.requests_total += len(batch)
+                self.batches_total += 1
+                self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+                self.inference_seconds_total += elapsed
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+    def stop(self):
+        """Stop the worker thread after its current batch"""
+        self._stopped.set()
+        self._worker.join()
+
+    def metrics(self):
+        """Snapshot of queue depth and batch-size statistics"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'requests_total': self.requests_total,
+                'batches_total': self.batches_total,
+                'mean_batch_size': self.requests_total / self.batches_total if self.batches_total else 0.0,
+                'batch_size_counts': dict(self.batch_size_counts),
+                'inference_seconds_total': self.inference_seconds_total,
+            }
+
+    def metrics_text(self):
+        """Metrics in Prometheus text exposition format"""
+        m = self.metrics()
+        lines = [
+            '# HELP pneumonia_queue_depth Requests waiting to be batched',
+            '# TYPE pneumonia_queue_depth gauge',
+            f"pneumonia_queue_depth {m['queue_depth']}",
+            '# HELP pneumonia_requests_total Images scored',
+            '# TYPE pneumonia_requests_total counter',
+            f"pneumonia_requests_total {m['requests_total']}",
+            '# HELP pneumonia_batches_total Forward passes run',
+            '# TYPE pneumonia_batches_total counter',
+            f"pneumonia_batches_total {m['batches_total']}",
+            '# HELP pneumonia_inference_seconds_total Time spent in forward passes',
+            '# TYPE pneumonia_inference_seconds_total counter',
+            f"pneumonia_inference_seconds_total {m['inference_seconds_total']:.6f}",
+            '# HELP pneumonia_batch_size Batch size distribution',
+            '# TYPE pneumonia_batch_size histogram',
+        ]
+        cumulative = 0
+        for size in range(1, self.max_batch_size + 1):
+            cumulative += m['batch_size_counts'].get(size, 0)
+            lines.append(f'pneumonia_batch_size_bucket{{le="{size}"}} {cumulative}')
+        lines.append(f'pneumonia_batch_size_bucket{{le="+Inf"}} {cumulative}')
+        lines.append(f"pneumonia_batch_size_sum {m['requests_total']}")
+        lines.append(f"pneumonia_batch_size_count {m['batches_total']}")
+        return '\n'.join(lines) + '\n'
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """Decodes uploads on the request thread and hands them to the shared batcher"""
+
+    batcher = None
+    preprocess = None
+    request_timeout = 30
+    max_body_bytes = 32 * 1024 * 1024
+    # Socket timeout in seconds: a client that stalls mid-upload is dropped instead of holding a thread
+    timeout = 30
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload))
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            self._send(200, self.batcher.metrics_text() + get_stage_metrics().to_prometheus(),
+                       'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self._send_json(400, {'error': 'Content-Length must be a whole number of bytes'})
+            return
+        if length <= 0:
+            self._send_json(400, {'error': 'empty request body; send the image bytes'})
+            return
+        if length > self.max_body_bytes:
+            # The body is never read, so the connection cannot be reused
+            self.close_connection = True
+            self._send_json(413, {'error': f'request body over {self.max_body_bytes} bytes'})
+            return
+
+        metrics = get_stage_metrics()
+        # A read that times out propagates to handle_one_request, which closes the connection
+        with metrics.time('upload'):
+            image_bytes = self.rfile.read(length)
+        if len(image_bytes) < length:
+            self._send_json(400, {'error': f'request body ended after {len(image_bytes)} of {length} bytes'})
+            return
+
+        try:
+            # Left undecoded so preprocessing can use JPEG draft mode; the decode is timed as part of it
+            with metrics.time('preprocess'):
+                img_input = self.preprocess(Image.open(io.BytesIO(image_bytes)))
+        except Exception as e:
+            self._send_json(400, {'error': f'could not decode image: {e}'})
+            return
+
+        try:
+            prediction, confidence, normal_prob, pneumonia_prob = self.batcher.predict(
+                img_input, timeout=self.request_timeout
+            )
+        except Exception as e:
+            self._send_json(500, {'error': f'prediction failed: {e}'})
+            return
+
+        self._send_json(200, {
+            'prediction': prediction,
+            'confidence': confidence,
+            'normal_prob': normal_prob,
+            'pneumonia_prob': pneumonia_prob,
+        })
+
+    def log_message(self, format, *args):
+        # Per-request access logs drown out everything else under load
+        pass
+
+
+def make_server(batcher, preprocess, host='127.0.0.1', port=8080, max_body_mb=32):
+    """Threaded HTTP server bound to a batcher and its preprocessing; port=0 picks a free port"""
+    handler = type('BoundPredictionHandler', (PredictionHandler,),
+                   {'batcher': batcher, 'preprocess': staticmethod(preprocess),
+                    'max_body_bytes': int(max_body_mb * 1024 * 1024)})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def load_backend(engine, model_path=None, threads=0):
+    """(preprocess, predict_fn) for an engine; only the non-onnx engines import torch"""
+    if engine == 'onnx':
+        from onnx_engine import ONNX_MODEL_PATH, OnnxPredictor, preprocess
+        predictor = OnnxPredictor(model_path or ONNX_MODEL_PATH, intra_op_threads=threads)
+        return preprocess, predictor.predict_arrays
+
+    import numpy as np
+    import torch
+    from inference import load_engine, normalize_gray_batch, predict_tensors
+    from preprocessing import to_grayscale
+
+    if model_path is None and ENGINE_WEIGHTS[engine] == MODEL_PATH:
+        from download_model import download_model
+        if not download_model():
+            raise SystemExit(1)
+    if threads:
+        torch.set_num_threads(threads)
+
+    model, device = load_engine(engine, model_path)
+    return to_grayscale, lambda grays: predict_tensors(normalize_gray_batch(np.stack(grays)), model, device)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the pneumonia model over HTTP with micro-batching")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--engine', choices=ENGINES, default='fp32', help="Inference engine")
+    parser.add_argument('--model-path', help="Weights for the engine (default: models/ file for --engine)")
+    parser.add_argument('--threads', type=int, default=0, help="Compute threads (0 = library default)")
+    parser.add_argument('--max-batch-size', type=int, default=16, help="Largest micro-batch")
+    parser.add_argument('--max-wait-ms', type=float, default=10,
+                        help="Longest time a request waits for a batch to fill")
+    parser.add_argument('--max-body-mb', type=float, default=32,
+                        help="Largest upload accepted; bigger requests get 413 (default: %(default)s)")
+    args = parser.parse_args()
+
+    preprocess, predict_fn = load_backend(args.engine, args.model_path, args.threads)
+    batcher = MicroBatcher(predict_fn, args.max_batch_size, args.max_wait_ms)
+    server = make_server(batcher, preprocess, args.host, args.port, args.max_body_mb)
+    print(f"🚀 Serving {args.engine} model on http://{args.host}:{server.server_port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms} ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down")
+    finally:
+        server.server_close()
+        batcher.stop()
+
+
+if __name__ == "__main__":
+    main()
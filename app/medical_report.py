@@ -0,0 +1,479 @@
+"""
+═══════════════════════════════════════════════════════════════
+MEDICAL REPORT - PDF Report and Chart Generation
+═══════════════════════════════════════════════════════════════
+ReportLab PDF report and the matplotlib charts embedded in it.
+Kept out of the Streamlit script so the report stack is only
+imported when a report is actually built. The PDF draws its
+charts as reportlab vectors (vector_charts.py); the matplotlib PNG
+versions below back the on-screen preview through chart_cache.py.
+═══════════════════════════════════════════════════════════════
+"""
+
+from datetime import datetime
+import io
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage, PageBreak
+from reportlab.platypus import Frame, PageTemplate
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+from chart_cache import get_chart_cache
+from vector_charts import risk_gauge_drawing, symptoms_drawing
+from stage_metrics import get_stage_metrics
+
+def create_risk_gauge_chart(risk_score, risk_category):
+    """Create a colorful risk gauge chart"""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 4))
+    
+    # Create the gauge
+    colors_map = ['#81c784', '#fff59d', '#ef9a9a']
+    bounds = [0, 30, 60, 100]
+    
+    # Draw the gauge background
+    for i in range(len(colors_map)):
+        ax.barh(0, bounds[i+1] - bounds[i], left=bounds[i], height=0.3, 
+                color=colors_map[i], alpha=0.7, edgecolor='white', linewidth=2)
+    
+    # Draw the risk pointer
+    ax.plot([risk_score, risk_score], [-0.2, 0.5], 'k-', linewidth=4)
+    ax.plot(risk_score, 0.5, 'ko', markersize=15)
+    
+    # Labels
+    ax.text(15, -0.5, 'LOW\n0-30', ha='center', fontsize=12, fontweight='bold', color='#1b5e20')
+    ax.text(45, -0.5, 'MEDIUM\n30-60', ha='center', fontsize=12, fontweight='bold', color='#f57f17')
+    ax.text(80, -0.5, 'HIGH\n60-100', ha='center', fontsize=12, fontweight='bold', color='#b71c1c')
+    
+    # Risk score text
+    ax.text(risk_score, 0.8, f'{risk_score}', ha='center', fontsize=24, fontweight='bold', color='#0d47a1')
+    ax.text(risk_score, 1.2, f'{risk_category} RISK', ha='center', fontsize=14, fontweight='bold', color='#1565c0')
+    
+    ax.set_xlim(0, 100)
+    ax.set_ylim(-1, 1.5)
+    ax.axis('off')
+    
+    # Save to bytes
+    buf = io.BytesIO()
+    plt.tight_layout()
+    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    buf.seek(0)
+    plt.close()
+    
+    return buf
+
+def create_symptoms_chart(has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition):
+    """Create a colorful symptoms presence chart"""
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(8, 5))
+    
+    symptoms = ['Fever', 'Cough', 'Dyspnea', 'Smoking\nHistory', 'Chronic\nDisease']
+    values = [has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]
+    colors_list = ['#ef5350' if v else '#e0e0e0' for v in values]
+    
+    ax.barh(symptoms, [1]*5, color=colors_list, edgecolor='white', linewidth=2)
+    
+    # Add checkmarks or X marks
+    for i, (symptom, value) in enumerate(zip(symptoms, values)):
+        if value:
+            ax.text(0.5, i, '✓ PRESENT', ha='center', va='center', 
+                   fontsize=14, fontweight='bold', color='white')
+        else:
+            ax.text(0.5, i, '✗ ABSENT', ha='center', va='center', 
+                   fontsize=14, fontweight='bold', color='#757575')
+    
+    ax.set_xlim(0, 1)
+    ax.set_xlabel('Clinical Indicators', fontsize=12, fontweight='bold')
+    ax.set_title('Symptom Profile', fontsize=16, fontweight='bold', color='#0d47a1', pad=20)
+    ax.set_xticks([])
+    
+    # Remove spines
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    
+    # Save to bytes
+    buf = io.BytesIO()
+    plt.tight_layout()
+    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
+    buf.seek(0)
+    plt.close()
+    
+    return buf
+
+class ReportBuilder:
+    """Writes one or more patient reports into a single PDF, building styles only once"""
+
+    def __init__(self, sink, vector_charts=True):
+        """
+        Args:
+            sink (str or file-like): Output path or writable binary file object
+            vector_charts (bool): Draw charts with reportlab (True) or embed matplotlib PNGs
+        """
+        self.vector_charts = vector_charts
+        self.patients = 0
+        self.doc = SimpleDocTemplate(sink, pagesize=letter, rightMargin=50, leftMargin=50,
+                                     topMargin=50, bottomMargin=50)
+        self._define_styles()
+
+        # SimpleDocTemplate.build() lays out a complete story in one call; the same steps are
+        # run here so each patient's flowables are laid out (and released) as they are added
+        doc = self.doc
+        doc._calc()
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+        doc.addPageTemplates([PageTemplate(id='First', frames=frame, pagesize=doc.pagesize),
+                              PageTemplate(id='Later', frames=frame, pagesize=doc.pagesize)])
+        doc._startBuild(sink)
+        doc.canv._doctemplate = doc
+
+    def _define_styles(self):
+        # Define styles
+        styles = getSampleStyleSheet()
+        
+        # Custom styles
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#0d47a1'),
+            spaceAfter=30,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        )
+        
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=16,
+            textColor=colors.HexColor('#1976d2'),
+            spaceAfter=12,
+            spaceBefore=12,
+            fontName='Helvetica-Bold',
+            borderWidth=2,
+            borderColor=colors.HexColor('#42a5f5'),
+            borderPadding=10,
+            backColor=colors.HexColor('#e3f2fd')
+        )
+        
+        self.body_style = ParagraphStyle(
+            'CustomBody',
+            parent=styles['BodyText'],
+            fontSize=11,
+            textColor=colors.HexColor('#263238'),
+            spaceAfter=10,
+            leading=16
+        )
+        
+        self.footer_style = ParagraphStyle('Footer', parent=self.body_style, 
+                                           alignment=TA_CENTER, fontSize=9, 
+                                           textColor=colors.HexColor('#757575'))
+        
+        self.header_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1976d2')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 18),
+            ('TOPPADDING', (0, 0), (-1, -1), 20),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 20),
+            ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#0d47a1')),
+        ])
+        
+        self.meta_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f5f5f5')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1565c0')),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bbdefb')),
+        ])
+        
+        self.patient_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
+            ('BACKGROUND', (1, 0), (1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#0d47a1')),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#90caf9')),
+        ])
+        
+        self.clinical_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#fff9c4')),
+            ('BACKGROUND', (1, 0), (1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#f57f17')),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#fff59d')),
+        ])
+        
+        self.history_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ffccbc')),
+            ('BACKGROUND', (1, 0), (1, -1), colors.white),
+            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#d84315')),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('TOPPADDING', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ffab91')),
+        ])
+        
+        # Risk recommendation based on category
+        self.recommendations = {}
+        for category, recommendation, rec_color in [
+            ("LOW", "🏠 Home monitoring advised. Seek medical evaluation if symptoms worsen.",
+             colors.HexColor('#4caf50')),
+            ("MEDIUM", "🏥 Outpatient evaluation recommended. Consider diagnostic imaging.",
+             colors.HexColor('#fbc02d')),
+            ("HIGH", "🚨 Immediate medical attention required. Emergency department assessment indicated.",
+             colors.HexColor('#f44336')),
+        ]:
+            self.recommendations[category] = (recommendation, TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), rec_color),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 12),
+                ('TOPPADDING', (0, 0), (-1, -1), 15),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+                ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ]))
+        
+        # Color based on prediction
+        self.xray_table_styles = {}
+        for is_normal, bg_color, text_color in [
+            (True, colors.HexColor('#c8e6c9'), colors.HexColor('#1b5e20')),
+            (False, colors.HexColor('#ffcdd2'), colors.HexColor('#b71c1c')),
+        ]:
+            self.xray_table_styles[is_normal] = TableStyle([
+                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e1f5fe')),
+                ('BACKGROUND', (1, 0), (1, 0), bg_color),
+                ('TEXTCOLOR', (1, 0), (1, 0), text_color),
+                ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#01579b')),
+                ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+                ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, -1), 11),
+                ('TOPPADDING', (0, 0), (-1, -1), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#81d4fa')),
+            ])
+        
+        self.disclaimer_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#fff9c4')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TOPPADDING', (0, 0), (-1, -1), 15),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+            ('LEFTPADDING', (0, 0), (-1, -1), 15),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 15),
+            ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#f57f17')),
+        ])
+
+    def add_patient(self, patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+                    is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+                    prediction=None, confidence=None, analysis=None):
+        """Lay out one patient's report, starting on a new page after the first patient"""
+        elements = [PageBreak()] if self.patients else []
+        elements += self._patient_elements(
+            patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+            is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+            prediction, confidence, analysis
+        )
+        doc = self.doc
+        while elements:
+            doc.clean_hanging()
+            doc.handle_flowable(elements)
+        self.patients += 1
+
+    def close(self):
+        """Finish the last page and write the document to the sink"""
+        del self.doc.canv._doctemplate
+        self.doc._endBuild()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # A failed patient leaves the document unfinished rather than writing a partial PDF
+        if exc_type is None:
+            self.close()
+
+    def _patient_elements(self, patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+                          is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+                          prediction, confidence, analysis):
+        if analysis is not None and prediction is None:
+            prediction, confidence = analysis.prediction, analysis.confidence
+        title_style = self.title_style
+        heading_style = self.heading_style
+        body_style = self.body_style
+        
+        # Container for the 'Flowable' objects
+        elements = []
+        
+        # Header with colored background
+        header_data = [[Paragraph('<b>🫁 PNEUMONIA DETECTION SYSTEM</b><br/>Medical Analysis Report', title_style)]]
+        header_table = Table(header_data, colWidths=[7*inch])
+        header_table.setStyle(self.header_table_style)
+        elements.append(header_table)
+        elements.append(Spacer(1, 20))
+    
+        # Report metadata
+        report_time = datetime.now().strftime('%B %d, %Y at %H:%M:%S')
+        report_id = f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    
+        meta_data = [
+            ['Report Generated:', report_time],
+            ['Report ID:', report_id],
+            ['Model Accuracy:', '85.58%']
+        ]
+        if analysis is not None:
+            # Ties the report to the exact image bytes that were analyzed
+            meta_data.append(['X-ray Image:', f"{analysis.file_name or 'upload'} (SHA-256 {analysis.image_hash[:16]})"])
+        meta_table = Table(meta_data, colWidths=[2*inch, 4.5*inch])
+        meta_table.setStyle(self.meta_table_style)
+        elements.append(meta_table)
+        elements.append(Spacer(1, 20))
+    
+        # Patient Demographics Section
+        elements.append(Paragraph('👤 PATIENT DEMOGRAPHICS', heading_style))
+    
+        patient_data = [
+            ['Full Name:', patient_name],
+            ['Age:', f'{age} years'],
+            ['Gender:', gender],
+            ['Assessment Date:', datetime.now().strftime('%Y-%m-%d')]
+        ]
+        patient_table = Table(patient_data, colWidths=[2*inch, 4.5*inch])
+        patient_table.setStyle(self.patient_table_style)
+        elements.append(patient_table)
+        elements.append(Spacer(1, 20))
+    
+        # Clinical Presentation Section
+        elements.append(Paragraph('🩺 CLINICAL PRESENTATION', heading_style))
+    
+        clinical_data = [
+            ['Pyrexia (Fever):', '✓ Present' if has_fever else '✗ Absent'],
+            ['Persistent Cough:', '✓ Present' if has_cough else '✗ Absent'],
+            ['Dyspnea:', '✓ Present' if has_breathing_difficulty else '✗ Absent'],
+            ['Symptom Duration:', f'{symptom_days} days']
+        ]
+        clinical_table = Table(clinical_data, colWidths=[2*inch, 4.5*inch])
+        clinical_table.setStyle(self.clinical_table_style)
+        elements.append(clinical_table)
+        elements.append(Spacer(1, 20))
+    
+        # Medical History Section
+        elements.append(Paragraph('⚠️ MEDICAL HISTORY', heading_style))
+    
+        history_data = [
+            ['Tobacco Use:', '✓ Positive' if is_smoker else '✗ Negative'],
+            ['Chronic Pulmonary Disease:', '✓ Positive' if has_chronic_condition else '✗ Negative']
+        ]
+        history_table = Table(history_data, colWidths=[2*inch, 4.5*inch])
+        history_table.setStyle(self.history_table_style)
+        elements.append(history_table)
+        elements.append(Spacer(1, 30))
+    
+        # Risk Assessment with Gauge Chart
+        elements.append(Paragraph('📊 CLINICAL RISK ASSESSMENT', heading_style))
+    
+        # Create and add risk gauge chart
+        if self.vector_charts:
+            risk_chart_img = risk_gauge_drawing(risk_score, risk_category)
+        else:
+            risk_chart_buf = io.BytesIO(get_chart_cache().risk_gauge(risk_score, risk_category))
+            risk_chart_img = RLImage(risk_chart_buf, width=6*inch, height=3*inch)
+        elements.append(risk_chart_img)
+        elements.append(Spacer(1, 10))
+    
+        recommendation, rec_table_style = self.recommendations.get(risk_category, self.recommendations["HIGH"])
+        
+        rec_data = [[Paragraph(f'<b>Clinical Recommendation:</b> {recommendation}', body_style)]]
+        rec_table = Table(rec_data, colWidths=[6.5*inch])
+        rec_table.setStyle(rec_table_style)
+        elements.append(rec_table)
+        elements.append(Spacer(1, 20))
+    
+        # Symptoms Chart
+        if self.vector_charts:
+            symptoms_chart_img = symptoms_drawing(has_fever, has_cough, has_breathing_difficulty,
+                                                  is_smoker, has_chronic_condition)
+        else:
+            symptoms_chart_buf = io.BytesIO(get_chart_cache().symptoms(has_fever, has_cough, has_breathing_difficulty,
+                                                                        is_smoker, has_chronic_condition))
+            symptoms_chart_img = RLImage(symptoms_chart_buf, width=6*inch, height=3.5*inch)
+        elements.append(symptoms_chart_img)
+        elements.append(Spacer(1, 20))
+    
+        # X-Ray Analysis Section (if available)
+        if prediction:
+            elements.append(PageBreak())
+            elements.append(Paragraph('🔬 AI-POWERED RADIOGRAPHIC ANALYSIS', heading_style))
+        
+            xray_data = [
+                ['AI Interpretation:', prediction.upper()],
+                ['Confidence Level:', f'{confidence:.2f}%'],
+                ['Model Architecture:', 'ResNet-18 Deep Learning'],
+                ['Training Accuracy:', '85.58%']
+            ]
+            xray_table = Table(xray_data, colWidths=[2*inch, 4.5*inch])
+        
+            xray_table.setStyle(self.xray_table_styles[prediction == "Normal"])
+            elements.append(xray_table)
+            elements.append(Spacer(1, 20))
+    
+        # Disclaimer
+        elements.append(Spacer(1, 30))
+        disclaimer_text = '''
+        <b>⚕️ MEDICAL DISCLAIMER:</b><br/>
+        This report is generated by an AI-assisted clinical decision support system. 
+        All diagnostic findings and treatment recommendations must be reviewed and validated 
+        by a qualified, licensed healthcare professional. This technology is intended to 
+        augment, not replace, clinical judgment. The system is for research and educational 
+        purposes only and is not FDA approved for clinical diagnostic use.
+        '''
+        disclaimer_para = Paragraph(disclaimer_text, body_style)
+    
+        disclaimer_data = [[disclaimer_para]]
+        disclaimer_table = Table(disclaimer_data, colWidths=[6.5*inch])
+        disclaimer_table.setStyle(self.disclaimer_table_style)
+        elements.append(disclaimer_table)
+    
+        # Footer
+        elements.append(Spacer(1, 20))
+        footer_text = '''
+        <b>Pneumonia Detection System v1.0</b><br/>
+        Developed by Ayoolumi Melehon | Clinical AI Technology<br/>
+        © 2024 All Rights Reserved
+        '''
+        footer_para = Paragraph(footer_text, self.footer_style)
+        elements.append(footer_para)
+        
+        return elements
+
+def generate_pdf_report(patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+                        is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+                        prediction=None, confidence=None, analysis=None, vector_charts=True):
+    """Generate a colorful, graphical PDF report (vector_charts=False embeds the matplotlib PNGs)"""
+    buffer = io.BytesIO()
+    with get_stage_metrics().time('pdf_build'):
+        with ReportBuilder(buffer, vector_charts) as builder:
+            builder.add_patient(
+                patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+                is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+                prediction, confidence, analysis
+            )
+    buffer.seek(0)
+    
+    return buffer
@@ -0,0 +1,74 @@
+"""
+═══════════════════════════════════════════════════════════════
+ONNX RUNTIME ENGINE - Torch-Free CPU Inference
+═══════════════════════════════════════════════════════════════
+Runs the exported ONNX graph (see onnx_export.py) with ONNX
+Runtime's CPU provider. Preprocessing is the PIL + NumPy grayscale
+path from preprocessing.py, so a replica using this module never
+imports torch or torchvision.
+═══════════════════════════════════════════════════════════════
+"""
+
+import numpy as np
+import onnxruntime as ort
+
+from engines import ONNX_MODEL_PATH
+from preprocessing import normalize_batch, to_grayscale
+from stage_metrics import get_stage_metrics
+
+# Same order as inference.CLASS_NAMES; repeated here to keep this module torch-free
+CLASS_NAMES = ['Normal', 'Pneumonia']
+
+
+def preprocess(image):
+    """(224, 224) uint8 grayscale array from a PIL image; normalized per batch in predict_arrays"""
+    return to_grayscale(image)
+
+
+def _softmax(logits):
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class OnnxPredictor:
+    """ONNX Runtime session on the CPU provider with explicit thread controls"""
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, intra_op_threads=0, inter_op_threads=0):
+        """
+        Args:
+            model_path (str): Exported ONNX graph
+            intra_op_threads (int): Threads used inside each operator (0 = ONNX Runtime default)
+            inter_op_threads (int): Threads used across independent operators (0 = default)
+        """
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        """Raw logits for a preprocessed (N, 3, 224, 224) float32 batch"""
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+    def predict_arrays(self, arrays):
+        """Prediction tuples for a list of (224, 224) uint8 grayscale arrays"""
+        metrics = get_stage_metrics()
+        batch = normalize_batch(np.stack(arrays))
+        with metrics.time('forward'):
+            logits = self.run(batch)
+        with metrics.time('postprocess'):
+            probabilities = _softmax(logits)
+            results = []
+            for normal_p, pneumonia_p in probabilities.tolist():
+                pred = int(pneumonia_p > normal_p)
+                results.append((CLASS_NAMES[pred], max(normal_p, pneumonia_p) * 100,
+                                normal_p * 100, pneumonia_p * 100))
+        return results
+
+    def predict(self, images, batch_size=32):
+        """Classify a list of PIL images, one session run per chunk of batch_size"""
+        results = []
+        for start in range(0, len(images), batch_size):
+            results.extend(self.predict_arrays([preprocess(image) for image in images[start:start + batch_size]]))
+        return results
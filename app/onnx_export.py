@@ -0,0 +1,81 @@
+"""
+═══════════════════════════════════════════════════════════════
+ONNX EXPORT - Export and Parity Check for the ONNX Runtime Engine
+═══════════════════════════════════════════════════════════════
+Exports the trained PyTorch model to ONNX with a dynamic batch
+dimension, then checks that ONNX Runtime reproduces the PyTorch
+probabilities within a tolerance on a fixed set of images. Exits
+non-zero if parity fails, so it can gate a deployment.
+
+Usage:
+    python app/onnx_export.py --parity-dir data/chest_xray/test
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import torch
+from PIL import Image
+
+from batch_score import find_images
+from inference import MODEL_PATH, load_weights, predict_batch
+from onnx_engine import ONNX_MODEL_PATH, OnnxPredictor
+
+
+def export_onnx(model, path=ONNX_MODEL_PATH, opset_version=17):
+    """Export an eval-mode model with a dynamic batch axis, writing the file atomically"""
+    example = torch.zeros(1, 3, 224, 224)
+    tmp_path = f"{path}.tmp"
+    torch.onnx.export(
+        model, (example,), tmp_path,
+        input_names=['image'], output_names=['logits'],
+        dynamic_axes={'image': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset_version,
+        dynamo=False
+    )
+    os.replace(tmp_path, path)
+
+
+def check_parity(model, device, predictor, image_paths, atol=1e-4, batch_size=16):
+    """Largest absolute probability difference (0-1 scale) and whether every prediction matches"""
+    max_diff = 0.0
+    labels_match = True
+    for start in range(0, len(image_paths), batch_size):
+        images = [Image.open(p).convert('RGB') for p in image_paths[start:start + batch_size]]
+        torch_results = predict_batch(images, model, device)
+        onnx_results = predictor.predict(images)
+        for t, o in zip(torch_results, onnx_results):
+            labels_match &= t[0] == o[0]
+            max_diff = max(max_diff, abs(t[2] - o[2]) / 100, abs(t[3] - o[3]) / 100)
+    return max_diff, labels_match and max_diff <= atol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the pneumonia model to ONNX and verify parity")
+    parser.add_argument('--model-path', default=MODEL_PATH, help="PyTorch weights (default: %(default)s)")
+    parser.add_argument('--output', default=ONNX_MODEL_PATH, help="ONNX graph (default: %(default)s)")
+    parser.add_argument('--parity-dir', help="Images used to compare ONNX Runtime against PyTorch")
+    parser.add_argument('--parity-size', type=int, default=64, help="Number of images in the parity set")
+    parser.add_argument('--atol', type=float, default=1e-4, help="Allowed probability difference (0-1 scale)")
+    args = parser.parse_args()
+
+    model, device = load_weights(args.model_path)
+    export_onnx(model, args.output)
+    print(f"💾 Exported ONNX model to {args.output}")
+
+    if args.parity_dir:
+        parity_dir = Path(args.parity_dir)
+        # First N images in sorted order keep the parity set fixed between runs
+        paths = [parity_dir / p for p in find_images(parity_dir)[:args.parity_size]]
+        max_diff, passed = check_parity(model, device, OnnxPredictor(args.output), paths, args.atol)
+        print(f"🔍 Parity on {len(paths)} images: max probability difference {max_diff:.2e} (atol {args.atol:.0e})")
+        if not passed:
+            print("❌ ONNX Runtime output does not match PyTorch")
+            raise SystemExit(1)
+        print("✅ ONNX Runtime matches PyTorch")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,24 +9,19 @@ Author: Ayoolumi Melehon
 """
 
 import streamlit as st
-import torch
-import torch.nn as nn
-from torchvision import transforms, models
-from PIL import Image
-import numpy as np
-import pandas as pd
 from datetime import datetime
 import io
+import os
 from download_model import download_model
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-from reportlab.pdfgen import canvas
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+from inference_cache import InferenceCache
+from preprocessing import load_grayscale
+from report_cache import ReportCache, report_key
+from chart_cache import get_chart_cache
+from risk_engine import get_risk_engine
+from stage_metrics import get_stage_metrics
+from analysis_state import get_analysis
+# torch (via inference), pandas, reportlab (medical_report) and matplotlib (on a
+# chart_cache miss) are imported where first needed so the page renders without them
 
 # ═══════════════════════════════════════════════════════════════
 # PAGE CONFIGURATION
@@ -873,9 +868,14 @@ st.markdown("""
 # MODEL LOADING - UPDATED FOR GOOGLE DRIVE
 # ═══════════════════════════════════════════════════════════════
 
+# Inference engine chosen at startup: 'fp32' (default), 'int8' (see quantization.py) or 'bf16' (see precision_benchmark.py)
+INFERENCE_ENGINE = os.environ.get('PNEUMONIA_ENGINE', 'fp32')
+
 @st.cache_resource
 def load_model():
     """Load model with Google Drive download support"""
+    import torch
+    from inference import load_engine
     
     # Download model from Google Drive if not present
     if not download_model():
@@ -883,435 +883,136 @@ def load_model():
         return None, torch.device('cpu')
     
     device = torch.device('cpu')
-    model = models.resnet18(weights=None)
-    num_features = model.fc.in_features
-    model.fc = nn.Sequential(
-        nn.Dropout(0.5),
-        nn.Linear(num_features, 128),
-        nn.ReLU(),
-        nn.Dropout(0.3),
-        nn.Linear(128, 2)
-    )
     
     try:
-        # Use relative path that works on Streamlit Cloud
-        model_path = 'models/best_model.pth'
-        model.load_state_dict(torch.load(model_path, map_location=device))
-        model.eval()
-        return model, device
+        # Relative paths under models/ work on Streamlit Cloud
+        return load_engine(INFERENCE_ENGINE)
     except Exception as e:
         st.error(f"Model loading error: {e}")
         return None, device
 
-transform = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-])
+@st.cache_resource
+def get_inference_cache():
+    """Shared prediction cache, scoped to the engine and the digest of its weights"""
+    # Set PNEUMONIA_CACHE_DIR to keep results across app restarts
+    disk_dir = os.environ.get('PNEUMONIA_CACHE_DIR')
+    from engines import model_version
+    return InferenceCache(model_version(INFERENCE_ENGINE), max_entries=256, disk_dir=disk_dir)
+
+@st.cache_resource
+def get_report_cache():
+    """Shared cache of rendered PDF reports, keyed by a digest of the report inputs"""
+    return ReportCache(max_entries=32)
+
+def load_analysis_model():
+    """load_model() on first use, so torch is only imported once an X-ray is uploaded"""
+    with st.spinner("🧠 Loading AI model..."):
+        model, device = load_model()
+    if model is None:
+        st.error("⚠️ Model initialization failed.")
+    return model, device
 
 # ═══════════════════════════════════════════════════════════════
 # FUNCTIONS
 # ═══════════════════════════════════════════════════════════════
 
-def calculate_clinical_risk(age, has_fever, has_cough, has_breathing_difficulty, 
-                           is_smoker, has_chronic_condition, symptom_days):
-    risk_score = 0
-    if age > 65: risk_score += 25
-    elif age > 45: risk_score += 15
-    elif age < 5: risk_score += 20
-    if has_fever: risk_score += 15
-    if has_cough: risk_score += 10
-    if has_breathing_difficulty: risk_score += 20
-    if symptom_days > 7: risk_score += 15
-    elif symptom_days > 3: risk_score += 10
-    if is_smoker: risk_score += 10
-    if has_chronic_condition: risk_score += 15
-    return min(risk_score, 100)
-
-def get_risk_category(risk_score):
-    if risk_score < 30: return "LOW", "🟢"
-    elif risk_score < 60: return "MEDIUM", "🟡"
-    else: return "HIGH", "🔴"
-
-def predict_xray(image, model, device):
+def predict_xray(gray, model, device):
+    """Classify one preprocessed 224x224 grayscale X-ray (see preprocessing.to_grayscale)"""
+    from inference import normalize_gray_batch, predict_tensors
     try:
-        img_tensor = transform(image).unsqueeze(0).to(device)
-        with torch.no_grad():
-            outputs = model(img_tensor)
-            probabilities = torch.softmax(outputs, dim=1)
-            confidence, predicted = torch.max(probabilities, 1)
-        class_names = ['Normal', 'Pneumonia']
-        prediction = class_names[predicted.item()]
-        confidence_score = confidence.item() * 100
-        normal_prob = probabilities[0][0].item() * 100
-        pneumonia_prob = probabilities[0][1].item() * 100
-        return prediction, confidence_score, normal_prob, pneumonia_prob
+        return predict_tensors(normalize_gray_batch(gray[None]), model, device)[0]
     except Exception as e:
         st.error(f"Prediction error: {e}")
         return None, None, None, None
 
-# ═══════════════════════════════════════════════════════════════
-# PDF REPORT GENERATION
-# ═══════════════════════════════════════════════════════════════
+def predict_xray_batch(grays, model, device, batch_size=32):
+    """Classify preprocessed grayscale X-rays, one forward pass per chunk of batch_size images"""
+    import numpy as np
+    from inference import normalize_gray_batch, predict_tensors
+    try:
+        results = []
+        for start in range(0, len(grays), batch_size):
+            img_tensor = normalize_gray_batch(np.stack(grays[start:start + batch_size]))
+            results.extend(predict_tensors(img_tensor, model, device))
+        return results
+    except Exception as e:
+        st.error(f"Batch prediction error: {e}")
+        return [(None, None, None, None)] * len(grays)
 
-def create_risk_gauge_chart(risk_score, risk_category):
-    """Create a colorful risk gauge chart"""
-    fig, ax = plt.subplots(figsize=(8, 4))
-    
-    # Create the gauge
-    colors_map = ['#81c784', '#fff59d', '#ef9a9a']
-    bounds = [0, 30, 60, 100]
-    
-    # Draw the gauge background
-    for i in range(len(colors_map)):
-        ax.barh(0, bounds[i+1] - bounds[i], left=bounds[i], height=0.3, 
-                color=colors_map[i], alpha=0.7, edgecolor='white', linewidth=2)
-    
-    # Draw the risk pointer
-    ax.plot([risk_score, risk_score], [-0.2, 0.5], 'k-', linewidth=4)
-    ax.plot(risk_score, 0.5, 'ko', markersize=15)
-    
-    # Labels
-    ax.text(15, -0.5, 'LOW\n0-30', ha='center', fontsize=12, fontweight='bold', color='#1b5e20')
-    ax.text(45, -0.5, 'MEDIUM\n30-60', ha='center', fontsize=12, fontweight='bold', color='#f57f17')
-    ax.text(80, -0.5, 'HIGH\n60-100', ha='center', fontsize=12, fontweight='bold', color='#b71c1c')
-    
-    # Risk score text
-    ax.text(risk_score, 0.8, f'{risk_score}', ha='center', fontsize=24, fontweight='bold', color='#0d47a1')
-    ax.text(risk_score, 1.2, f'{risk_category} RISK', ha='center', fontsize=14, fontweight='bold', color='#1565c0')
-    
-    ax.set_xlim(0, 100)
-    ax.set_ylim(-1, 1.5)
-    ax.axis('off')
-    
-    # Save to bytes
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    buf.seek(0)
-    plt.close()
-    
-    return buf
+def predict_xray_batch_cached(image_bytes_list, model, device):
+    """
+    predict_xray_batch backed by the inference cache; only misses are decoded and scored.
+    Returns (results, errors): errors maps the index of each upload that could not be
+    decoded to the reason, and its result is a None tuple.
+    """
+    errors = {}
+    def compute_batch(indices):
+        grays = {}
+        for i in indices:
+            try:
+                grays[i] = load_grayscale(io.BytesIO(image_bytes_list[i]))
+            except Exception as e:
+                errors[i] = str(e)
+        decoded = [i for i in indices if i in grays]
+        predictions = dict(zip(decoded, predict_xray_batch([grays[i] for i in decoded], model, device)))
+        return [predictions.get(i, (None, None, None, None)) for i in indices]
+    return get_inference_cache().get_or_compute_many(image_bytes_list, compute_batch), errors
 
-def create_symptoms_chart(has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition):
-    """Create a colorful symptoms presence chart"""
-    fig, ax = plt.subplots(figsize=(8, 5))
-    
-    symptoms = ['Fever', 'Cough', 'Dyspnea', 'Smoking\nHistory', 'Chronic\nDisease']
-    values = [has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]
-    colors_list = ['#ef5350' if v else '#e0e0e0' for v in values]
-    
-    bars = ax.barh(symptoms, [1]*5, color=colors_list, edgecolor='white', linewidth=2)
-    
-    # Add checkmarks or X marks
-    for i, (symptom, value) in enumerate(zip(symptoms, values)):
-        if value:
-            ax.text(0.5, i, '✓ PRESENT', ha='center', va='center', 
-                   fontsize=14, fontweight='bold', color='white')
-        else:
-            ax.text(0.5, i, '✗ ABSENT', ha='center', va='center', 
-                   fontsize=14, fontweight='bold', color='#757575')
-    
-    ax.set_xlim(0, 1)
-    ax.set_xlabel('Clinical Indicators', fontsize=12, fontweight='bold')
-    ax.set_title('Symptom Profile', fontsize=16, fontweight='bold', color='#0d47a1', pad=20)
-    ax.set_xticks([])
-    
-    # Remove spines
-    for spine in ax.spines.values():
-        spine.set_visible(False)
-    
-    # Save to bytes
-    buf = io.BytesIO()
-    plt.tight_layout()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight', facecolor='white')
-    buf.seek(0)
-    plt.close()
-    
-    return buf
+def render_study_results(uploaded_files, model, device):
+    """Score a multi-file upload in batches and show a per-image results table"""
+    import pandas as pd
+    with st.spinner(f"🔍 Analyzing {len(uploaded_files)} X-rays..."):
+        results, errors = predict_xray_batch_cached([f.getvalue() for f in uploaded_files], model, device)
+    
+    study_df = pd.DataFrame({
+        'File': [f.name for f in uploaded_files],
+        'Prediction': [r[0] for r in results],
+        'Confidence (%)': [r[1] for r in results],
+        'Normal (%)': [r[2] for r in results],
+        'Pneumonia (%)': [r[3] for r in results],
+        'Error': [errors.get(i, '') for i in range(len(results))]
+    })
+    if errors:
+        st.warning(f"⚠️ {len(errors)} file(s) could not be read as X-ray images; see the Error column.")
 
-def generate_pdf_report(patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
-                        is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
-                        prediction=None, confidence=None, uploaded_image=None):
-    """Generate a colorful, graphical PDF report"""
-    
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=50, leftMargin=50,
-                           topMargin=50, bottomMargin=50)
-    
-    # Container for the 'Flowable' objects
-    elements = []
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#0d47a1'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#1976d2'),
-        spaceAfter=12,
-        spaceBefore=12,
-        fontName='Helvetica-Bold',
-        borderWidth=2,
-        borderColor=colors.HexColor('#42a5f5'),
-        borderPadding=10,
-        backColor=colors.HexColor('#e3f2fd')
-    )
-    
-    body_style = ParagraphStyle(
-        'CustomBody',
-        parent=styles['BodyText'],
-        fontSize=11,
-        textColor=colors.HexColor('#263238'),
-        spaceAfter=10,
-        leading=16
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("X-Rays", len(study_df))
+    with col2:
+        st.metric("Pneumonia", int((study_df['Prediction'] == 'Pneumonia').sum()))
+    with col3:
+        st.metric("Normal", int((study_df['Prediction'] == 'Normal').sum()))
+    
+    st.dataframe(study_df.round(2), use_container_width=True, hide_index=True)
+    
+    st.download_button(
+        label="📥 Download Study Results (CSV)",
+        data=study_df.to_csv(index=False),
+        file_name=f"study_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv",
+        use_container_width=True
     )
-    
-    # Header with colored background
-    header_data = [[Paragraph('<b>🫁 PNEUMONIA DETECTION SYSTEM</b><br/>Medical Analysis Report', title_style)]]
-    header_table = Table(header_data, colWidths=[7*inch])
-    header_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#1976d2')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 18),
-        ('TOPPADDING', (0, 0), (-1, -1), 20),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 20),
-        ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#0d47a1')),
-    ]))
-    elements.append(header_table)
-    elements.append(Spacer(1, 20))
-    
-    # Report metadata
-    report_time = datetime.now().strftime('%B %d, %Y at %H:%M:%S')
-    report_id = f"RPT-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    
-    meta_data = [
-        ['Report Generated:', report_time],
-        ['Report ID:', report_id],
-        ['Model Accuracy:', '85.58%']
-    ]
-    meta_table = Table(meta_data, colWidths=[2*inch, 4.5*inch])
-    meta_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f5f5f5')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor('#1565c0')),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#bbdefb')),
-    ]))
-    elements.append(meta_table)
-    elements.append(Spacer(1, 20))
-    
-    # Patient Demographics Section
-    elements.append(Paragraph('👤 PATIENT DEMOGRAPHICS', heading_style))
-    
-    patient_data = [
-        ['Full Name:', patient_name],
-        ['Age:', f'{age} years'],
-        ['Gender:', gender],
-        ['Assessment Date:', datetime.now().strftime('%Y-%m-%d')]
-    ]
-    patient_table = Table(patient_data, colWidths=[2*inch, 4.5*inch])
-    patient_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e3f2fd')),
-        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#0d47a1')),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#90caf9')),
-    ]))
-    elements.append(patient_table)
-    elements.append(Spacer(1, 20))
-    
-    # Clinical Presentation Section
-    elements.append(Paragraph('🩺 CLINICAL PRESENTATION', heading_style))
-    
-    clinical_data = [
-        ['Pyrexia (Fever):', '✓ Present' if has_fever else '✗ Absent'],
-        ['Persistent Cough:', '✓ Present' if has_cough else '✗ Absent'],
-        ['Dyspnea:', '✓ Present' if has_breathing_difficulty else '✗ Absent'],
-        ['Symptom Duration:', f'{symptom_days} days']
-    ]
-    clinical_table = Table(clinical_data, colWidths=[2*inch, 4.5*inch])
-    clinical_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#fff9c4')),
-        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#f57f17')),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#fff59d')),
-    ]))
-    elements.append(clinical_table)
-    elements.append(Spacer(1, 20))
-    
-    # Medical History Section
-    elements.append(Paragraph('⚠️ MEDICAL HISTORY', heading_style))
-    
-    history_data = [
-        ['Tobacco Use:', '✓ Positive' if is_smoker else '✗ Negative'],
-        ['Chronic Pulmonary Disease:', '✓ Positive' if has_chronic_condition else '✗ Negative']
-    ]
-    history_table = Table(history_data, colWidths=[2*inch, 4.5*inch])
-    history_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ffccbc')),
-        ('BACKGROUND', (1, 0), (1, -1), colors.white),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#d84315')),
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('TOPPADDING', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#ffab91')),
-    ]))
-    elements.append(history_table)
-    elements.append(Spacer(1, 30))
-    
-    # Risk Assessment with Gauge Chart
-    elements.append(Paragraph('📊 CLINICAL RISK ASSESSMENT', heading_style))
-    
-    # Create and add risk gauge chart
-    risk_chart_buf = create_risk_gauge_chart(risk_score, risk_category)
-    risk_chart_img = RLImage(risk_chart_buf, width=6*inch, height=3*inch)
-    elements.append(risk_chart_img)
-    elements.append(Spacer(1, 10))
-    
-    # Risk recommendation based on category
-    if risk_category == "LOW":
-        recommendation = "🏠 Home monitoring advised. Seek medical evaluation if symptoms worsen."
-        rec_color = colors.HexColor('#4caf50')
-    elif risk_category == "MEDIUM":
-        recommendation = "🏥 Outpatient evaluation recommended. Consider diagnostic imaging."
-        rec_color = colors.HexColor('#fbc02d')
-    else:
-        recommendation = "🚨 Immediate medical attention required. Emergency department assessment indicated."
-        rec_color = colors.HexColor('#f44336')
-    
-    rec_data = [[Paragraph(f'<b>Clinical Recommendation:</b> {recommendation}', body_style)]]
-    rec_table = Table(rec_data, colWidths=[6.5*inch])
-    rec_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), rec_color),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 15),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-        ('LEFTPADDING', (0, 0), (-1, -1), 15),
-    ]))
-    elements.append(rec_table)
-    elements.append(Spacer(1, 20))
-    
-    # Symptoms Chart
-    symptoms_chart_buf = create_symptoms_chart(has_fever, has_cough, has_breathing_difficulty, 
-                                                is_smoker, has_chronic_condition)
-    symptoms_chart_img = RLImage(symptoms_chart_buf, width=6*inch, height=3.5*inch)
-    elements.append(symptoms_chart_img)
-    elements.append(Spacer(1, 20))
-    
-    # X-Ray Analysis Section (if available)
-    if prediction:
-        elements.append(PageBreak())
-        elements.append(Paragraph('🔬 AI-POWERED RADIOGRAPHIC ANALYSIS', heading_style))
-        
-        xray_data = [
-            ['AI Interpretation:', prediction.upper()],
-            ['Confidence Level:', f'{confidence:.2f}%'],
-            ['Model Architecture:', 'ResNet-18 Deep Learning'],
-            ['Training Accuracy:', '85.58%']
-        ]
-        xray_table = Table(xray_data, colWidths=[2*inch, 4.5*inch])
-        
-        # Color based on prediction
-        if prediction == "Normal":
-            bg_color = colors.HexColor('#c8e6c9')
-            text_color = colors.HexColor('#1b5e20')
-        else:
-            bg_color = colors.HexColor('#ffcdd2')
-            text_color = colors.HexColor('#b71c1c')
-        
-        xray_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e1f5fe')),
-            ('BACKGROUND', (1, 0), (1, 0), bg_color),
-            ('TEXTCOLOR', (1, 0), (1, 0), text_color),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#01579b')),
-            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 11),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#81d4fa')),
-        ]))
-        elements.append(xray_table)
-        elements.append(Spacer(1, 20))
-    
-    # Disclaimer
-    elements.append(Spacer(1, 30))
-    disclaimer_text = '''
-    <b>⚕️ MEDICAL DISCLAIMER:</b><br/>
-    This report is generated by an AI-assisted clinical decision support system. 
-    All diagnostic findings and treatment recommendations must be reviewed and validated 
-    by a qualified, licensed healthcare professional. This technology is intended to 
-    augment, not replace, clinical judgment. The system is for research and educational 
-    purposes only and is not FDA approved for clinical diagnostic use.
-    '''
-    disclaimer_para = Paragraph(disclaimer_text, body_style)
-    
-    disclaimer_data = [[disclaimer_para]]
-    disclaimer_table = Table(disclaimer_data, colWidths=[6.5*inch])
-    disclaimer_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#fff9c4')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('TOPPADDING', (0, 0), (-1, -1), 15),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-        ('LEFTPADDING', (0, 0), (-1, -1), 15),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 15),
-        ('GRID', (0, 0), (-1, -1), 2, colors.HexColor('#f57f17')),
-    ]))
-    elements.append(disclaimer_table)
-    
-    # Footer
-    elements.append(Spacer(1, 20))
-    footer_text = '''
-    <b>Pneumonia Detection System v1.0</b><br/>
-    Developed by Ayoolumi Melehon | Clinical AI Technology<br/>
-    © 2024 All Rights Reserved
-    '''
-    footer_para = Paragraph(footer_text, ParagraphStyle('Footer', parent=body_style, 
-                                                        alignment=TA_CENTER, fontSize=9, 
-                                                        textColor=colors.HexColor('#757575')))
-    elements.append(footer_para)
-    
-    # Build PDF
-    doc.build(elements)
-    buffer.seek(0)
-    
-    return buffer
+    st.caption("⚕️ *AI Decision Support Tool. Requires validation by licensed healthcare professional.*")
+
+def render_latency_panel():
+    """Sidebar debug table of per-stage latency percentiles (PNEUMONIA_METRICS_PANEL=1)"""
+    metrics = get_stage_metrics()
+    with st.sidebar.expander("⏱️ Stage Latency (debug)"):
+        snapshot = metrics.snapshot()
+        if not snapshot:
+            st.caption("No timings yet; upload an X-ray.")
+            return
+        st.table([
+            {'Stage': stage, 'Count': s['count'], 'p50 (ms)': f"{1000 * s[0.5]:.1f}",
+             'p95 (ms)': f"{1000 * s[0.95]:.1f}", 'p99 (ms)': f"{1000 * s[0.99]:.1f}"}
+            for stage, s in snapshot.items()
+        ])
+        st.download_button(
+            label="📥 Prometheus metrics",
+            data=metrics.to_prometheus(),
+            file_name="pneumonia_stage_metrics.prom",
+            mime="text/plain"
+        )
 
 # ═══════════════════════════════════════════════════════════════
 # MAIN APP
@@ -1334,11 +1035,8 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load model
-    model, device = load_model()
-    if model is None:
-        st.error("⚠️ Model initialization failed.")
-        return
+    # Scoring rules from risk_rules.json, recompiled here if the file was edited
+    risk_engine = get_risk_engine()
     
     # Sidebar
     st.sidebar.markdown("### 👤 PATIENT DEMOGRAPHICS")
@@ -1370,11 +1068,11 @@ def main():
         st.markdown("## 📊 Clinical Risk Assessment")
         
         if patient_name:
-            risk_score = calculate_clinical_risk(
+            risk_score = risk_engine.calculate_clinical_risk(
                 age, has_fever, has_cough, has_breathing_difficulty,
                 is_smoker, has_chronic_condition, symptom_days
             )
-            risk_category, risk_icon = get_risk_category(risk_score)
+            risk_category, risk_icon = risk_engine.get_risk_category(risk_score)
             
             col1, col2, col3 = st.columns(3)
             with col1:
@@ -1404,19 +1102,15 @@ def main():
             
             with st.expander("📋 Detailed Risk Analysis"):
                 st.markdown("### Contributing Factors:")
-                factors = []
-                if age > 65: factors.append("Advanced age (>65)")
-                elif age < 5: factors.append("Pediatric (<5)")
-                if has_fever: factors.append("Fever present")
-                if has_cough: factors.append("Persistent cough")
-                if has_breathing_difficulty: factors.append("Dyspnea")
-                if symptom_days > 7: factors.append("Prolonged symptoms (>7 days)")
-                if is_smoker: factors.append("Smoking history")
-                if has_chronic_condition: factors.append("Chronic lung disease")
+                # From the loaded rules, so the list always matches the score above
+                factors = risk_engine.contributing_factors(
+                    age, has_fever, has_cough, has_breathing_difficulty,
+                    is_smoker, has_chronic_condition, symptom_days
+                )
                 
                 if factors:
-                    for factor in factors:
-                        st.markdown(f"• {factor}")
+                    for factor, points in factors:
+                        st.markdown(f"• {factor} (+{points})")
                 else:
                     st.success("✓ Minimal risk factors")
         else:
@@ -1433,25 +1127,53 @@ def main():
         </div>
         """, unsafe_allow_html=True)
         
-        uploaded_file = st.file_uploader(
-            "Select X-ray image (JPEG/PNG)",
-            type=['jpg', 'jpeg', 'png']
+        upload_mode = st.radio(
+            "Upload mode",
+            ["Single X-ray", "Study folder (multiple X-rays)"],
+            horizontal=True
         )
         
+        uploaded_file = None
+        model = device = None
+        analysis = None
+        if upload_mode == "Single X-ray":
+            uploaded_file = st.file_uploader(
+                "Select X-ray image (JPEG/PNG)",
+                type=['jpg', 'jpeg', 'png']
+            )
+        else:
+            uploaded_files = st.file_uploader(
+                "Select X-ray images (JPEG/PNG)",
+                type=['jpg', 'jpeg', 'png'],
+                accept_multiple_files=True
+            )
+            if uploaded_files:
+                model, device = load_analysis_model()
+                if model is not None:
+                    render_study_results(uploaded_files, model, device)
+            else:
+                st.info("📤 Upload all X-rays of a study to analyze them in one batch")
+        
         if uploaded_file is not None:
-            image = Image.open(uploaded_file).convert('RGB')
+            model, device = load_analysis_model()
+        
+        if uploaded_file is not None and model is not None:
+            # Decoded, preprocessed and scored once per upload; reruns and the report tab reuse it
+            with st.spinner("🔍 Analyzing..."):
+                analysis = get_analysis(
+                    st.session_state, uploaded_file.getvalue(), uploaded_file.name,
+                    get_inference_cache(), lambda gray: predict_xray(gray, model, device)
+                )
             
             col1, col2 = st.columns([1, 1])
             
             with col1:
                 st.markdown("### 📷 Patient X-Ray")
-                st.image(image, use_container_width=True)
+                st.image(analysis.display_image, use_container_width=True)
             
             with col2:
                 st.markdown("### 🤖 AI Analysis")
-                
-                with st.spinner("🔍 Analyzing..."):
-                    prediction, confidence, normal_prob, pneumonia_prob = predict_xray(image, model, device)
+                prediction, confidence, normal_prob, pneumonia_prob = analysis.result
                 
                 if prediction:
                     if prediction == "Normal":
@@ -1462,6 +1184,7 @@ def main():
                     st.metric("Confidence", f"{confidence:.1f}%")
                     
                     st.markdown("#### Probabilities")
+                    import pandas as pd
                     prob_data = pd.DataFrame({
                         'Class': ['Normal', 'Pneumonia'],
                         'Probability (%)': [normal_prob, pneumonia_prob]
@@ -1485,7 +1208,7 @@ def main():
                             st.info("Appears normal. Clinical correlation recommended if symptomatic.")
                     
                     st.caption("⚕️ *AI Decision Support Tool. Requires validation by licensed healthcare professional.*")
-        else:
+        elif upload_mode == "Single X-ray":
             st.info("📤 Upload chest X-ray to begin analysis")
     
     # TAB 3 - ENHANCED WITH PDF DOWNLOAD
@@ -1494,18 +1217,17 @@ def main():
         
         if patient_name:
             # Calculate risk if not already done
-            risk_score = calculate_clinical_risk(
+            risk_score = risk_engine.calculate_clinical_risk(
                 age, has_fever, has_cough, has_breathing_difficulty,
                 is_smoker, has_chronic_condition, symptom_days
             )
-            risk_category, risk_icon = get_risk_category(risk_score)
+            risk_category, risk_icon = risk_engine.get_risk_category(risk_score)
             
             # Get prediction if X-ray was uploaded
             prediction = None
             confidence = None
-            if uploaded_file is not None:
-                image = Image.open(uploaded_file).convert('RGB')
-                prediction, confidence, _, _ = predict_xray(image, model, device)
+            if analysis is not None:
+                prediction, confidence = analysis.prediction, analysis.confidence
             
             # Display preview
             st.markdown(f"""
@@ -1527,20 +1249,32 @@ def main():
             col1, col2 = st.columns(2)
             
             with col1:
-                # Generate PDF
-                pdf_buffer = generate_pdf_report(
+                # Build the PDF only on request; identical inputs reuse the cached bytes
+                report_cache = get_report_cache()
+                pdf_key = report_key(
                     patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
                     is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
-                    prediction, confidence, uploaded_file
+                    prediction, confidence, analysis.image_hash if analysis is not None else None
                 )
+                pdf_bytes = report_cache.get(pdf_key)
+                pdf_slot = st.empty()
+                if pdf_bytes is None and pdf_slot.button("📄 Prepare PDF Report", use_container_width=True):
+                    import medical_report
+                    with st.spinner("📄 Building PDF report..."):
+                        pdf_bytes = report_cache.get_or_build(pdf_key, lambda: medical_report.generate_pdf_report(
+                            patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+                            is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+                            prediction, confidence, analysis
+                        ))
                 
-                st.download_button(
-                    label="📄 Download PDF Report",
-                    data=pdf_buffer,
-                    file_name=f"medical_report_{patient_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf",
-                    use_container_width=True
-                )
+                if pdf_bytes is not None:
+                    pdf_slot.download_button(
+                        label="📄 Download PDF Report",
+                        data=pdf_bytes,
+                        file_name=f"medical_report_{patient_name.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        use_container_width=True
+                    )
             
             with col2:
                 # Text report for backup
@@ -1593,12 +1327,12 @@ AI-assisted analysis. Requires professional validation.
             st.markdown("### 📊 Visual Report Preview")
             
             # Show risk gauge
-            risk_chart_buf = create_risk_gauge_chart(risk_score, risk_category)
+            risk_chart_buf = get_chart_cache().risk_gauge(risk_score, risk_category)
             st.image(risk_chart_buf, use_container_width=True)
             
             # Show symptoms chart
-            symptoms_chart_buf = create_symptoms_chart(has_fever, has_cough, has_breathing_difficulty, 
-                                                        is_smoker, has_chronic_condition)
+            symptoms_chart_buf = get_chart_cache().symptoms(has_fever, has_cough, has_breathing_difficulty,
+                                                            is_smoker, has_chronic_condition)
             st.image(symptoms_chart_buf, use_container_width=True)
             
         else:
@@ -1613,6 +1347,10 @@ AI-assisted analysis. Requires professional validation.
         <p>Research & Educational Platform | Not FDA Approved</p>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Drawn last so the table includes this run's timings
+    if os.environ.get('PNEUMONIA_METRICS_PANEL') == '1':
+        render_latency_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,137 @@
+"""
+═══════════════════════════════════════════════════════════════
+PRECISION BENCHMARK - bfloat16 Autocast vs fp32
+═══════════════════════════════════════════════════════════════
+CPUs with AVX512-BF16 or AMX run bfloat16 matrix multiplies and
+convolutions much faster than fp32. The 'bf16' inference engine
+and trainer.py's precision "bf16" run the forward pass under
+torch.autocast: convolutions and linear layers compute in bf16,
+while weights, softmax, the loss and the optimizer stay fp32.
+bf16 keeps fp32's exponent range, so no loss scaling is needed.
+
+This script decodes the test split once and scores it with both
+precisions, reporting accuracy, how many predictions agree, the
+largest probability difference and ms/image. It then compares
+training step throughput. With --train-config, it also trains
+the same config in each precision and compares test accuracy.
+
+Usage:
+    python app/precision_benchmark.py data/chest_xray/test
+    python app/precision_benchmark.py data/chest_xray/test --train-config my_run.json --epochs 3
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from batch_score import find_images, label_for, load_and_preprocess
+from inference import AUTOCAST_DTYPES, MODEL_PATH, load_engine, normalize_gray_batch, predict_tensors
+from training import training_throughput
+
+PRECISIONS = list(AUTOCAST_DTYPES)
+
+
+def native_bf16():
+    """True when oneDNN reports hardware bf16 support; otherwise bf16 is emulated and slower than fp32"""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def load_test_split(test_dir):
+    """(gray images, labels) for every labelled image under test_dir, decoded once"""
+    test_dir = Path(test_dir)
+    paths = [p for p in find_images(test_dir) if label_for(p)]
+    with ThreadPoolExecutor() as pool:
+        decoded = list(pool.map(load_and_preprocess, [test_dir / p for p in paths]))
+    kept = [(gray, label_for(p)) for (gray, _), p in zip(decoded, paths) if gray is not None]
+    if not kept:
+        raise ValueError(f"No labelled images found under {test_dir}")
+    grays, labels = zip(*kept)
+    return np.stack(grays), list(labels)
+
+
+def score(engine, model_path, grays, batch_size=32):
+    """(results, ms/image) of an inference engine over preprocessed grayscale images"""
+    model, device = load_engine(engine, model_path)
+    # One untimed batch so oneDNN's kernel selection is not billed to either precision
+    predict_tensors(normalize_gray_batch(grays[:batch_size]), model, device)
+    results = []
+    elapsed = 0.0
+    for start in range(0, len(grays), batch_size):
+        img_tensor = normalize_gray_batch(grays[start:start + batch_size])
+        t0 = time.perf_counter()
+        results.extend(predict_tensors(img_tensor, model, device))
+        elapsed += time.perf_counter() - t0
+    return results, 1000 * elapsed / len(grays)
+
+
+def compare_training(config_path, epochs=None):
+    """{precision: (best test acc, final test acc, seconds)} from fresh runs of the same config"""
+    from trainer import load_config, train
+
+    outcomes = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for precision in PRECISIONS:
+            run_dir = Path(tmp_dir) / precision
+            config = load_config(config_path, {'precision': precision, 'epochs': epochs, 'nproc': 1,
+                                               'checkpoint_dir': str(run_dir),
+                                               'model_path': str(run_dir / 'best.pth')})
+            print(f"\n🧠 Training in {precision}")
+            start = time.perf_counter()
+            history = train(config, fresh=True)
+            outcomes[precision] = (max(history['test_acc']), history['test_acc'][-1], time.perf_counter() - start)
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bf16 autocast with fp32 on the test split")
+    parser.add_argument('test_dir', help="Test directory with NORMAL and PNEUMONIA subfolders")
+    parser.add_argument('--model-path', default=MODEL_PATH, help="fp32 weights (default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--train-steps', type=int, default=5, help="Timed training steps per precision")
+    parser.add_argument('--train-config', help="trainer.py config to train once per precision")
+    parser.add_argument('--epochs', type=int, help="Override the epochs of --train-config")
+    args = parser.parse_args()
+
+    if not native_bf16():
+        print("⚠️ This CPU has no native bf16 (AVX512-BF16 / AMX); expect bf16 to be slower than fp32")
+
+    grays, labels = load_test_split(args.test_dir)
+    print(f"📁 {len(grays)} test images from {args.test_dir}")
+    scored = {precision: score(precision, args.model_path, grays, args.batch_size) for precision in PRECISIONS}
+    train_rates = {precision: training_throughput(args.batch_size, args.train_steps, precision)
+                   for precision in PRECISIONS}
+
+    fp32_results, fp32_ms = scored['fp32']
+    bf16_results, bf16_ms = scored['bf16']
+    agree = sum(a[0] == b[0] for a, b in zip(fp32_results, bf16_results))
+    max_diff = max(abs(a[3] - b[3]) for a, b in zip(fp32_results, bf16_results))
+    print("=" * 70)
+    for precision, (results, ms) in scored.items():
+        accuracy = 100 * sum(r[0] == label for r, label in zip(results, labels)) / len(labels)
+        print(f"   {precision}: accuracy {accuracy:.2f}% | {ms:.2f} ms/image | "
+              f"training {train_rates[precision]:.1f} images/s")
+    print(f"   Predictions agreeing: {agree}/{len(labels)} | max Δ pneumonia probability: {max_diff:.2f} pts")
+    print(f"   bf16 speed-up: inference {fp32_ms / bf16_ms:.2f}x | "
+          f"training {train_rates['bf16'] / train_rates['fp32']:.2f}x")
+    print("=" * 70)
+
+    if args.train_config:
+        outcomes = compare_training(args.train_config, args.epochs)
+        print("=" * 70)
+        for precision, (best_acc, final_acc, seconds) in outcomes.items():
+            print(f"   {precision} training: best test accuracy {best_acc:.2f}% | "
+                  f"final {final_acc:.2f}% | {seconds:.0f} s")
+        print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+═══════════════════════════════════════════════════════════════
+PREDICTION EXPORT - Streaming CSV / JSON Lines / Parquet Rows
+═══════════════════════════════════════════════════════════════
+Writes one row per scored X-ray as results are produced: file
+name, content hash, prediction, class probabilities, model version
+and latency. Rows are held in a small fixed-size buffer and flushed
+to the output file in blocks (a CSV or JSON Lines append, or one
+Parquet row group), so memory stays the same whether a run scores
+a hundred images or a million. The format follows the file suffix.
+
+Every flush is durable and the output doubles as the resume
+checkpoint, as in batch_score.py: CSV and JSON Lines are appended
+and fsynced, and Parquet becomes a directory of part files, one
+per flush. Rerunning the same command skips the files already in
+the output, so a crash at row 900k only loses the buffered rows.
+
+Usage:
+    python app/prediction_export.py data/chest_xray/test predictions.csv
+    python app/prediction_export.py /scans/backlog predictions.parquet --batch-size 64
+    python app/prediction_export.py --synthetic 1000000 /tmp/rows.jsonl
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from engines import ENGINE_WEIGHTS, ENGINES, MODEL_PATH, model_version
+from inference_cache import content_hash
+
+EXPORT_COLUMNS = ['filename', 'content_hash', 'prediction', 'confidence', 'normal_prob', 'pneumonia_prob',
+                  'model_version', 'latency_ms']
+EXPORT_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.parquet': 'parquet'}
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ('filename', pa.string()),
+        ('content_hash', pa.string()),
+        ('prediction', pa.string()),
+        ('confidence', pa.float64()),
+        ('normal_prob', pa.float64()),
+        ('pneumonia_prob', pa.float64()),
+        ('model_version', pa.string()),
+        ('latency_ms', pa.float64()),
+    ])
+
+
+class PredictionExporter:
+    """Append-only prediction rows with bounded buffering that double as the resume checkpoint"""
+
+    def __init__(self, output_path, model_version, buffer_rows=1024, format=None):
+        """
+        Args:
+            output_path (str): Destination; .csv, .jsonl / .ndjson, or .parquet for a directory of part files
+            model_version (str): Written on every row (see engines.model_version)
+            buffer_rows (int): Rows held in memory before a flush
+            format (str): 'csv', 'jsonl' or 'parquet' (default: from the suffix)
+        """
+        self.output_path = Path(output_path)
+        self.format = format or EXPORT_FORMATS.get(self.output_path.suffix.lower())
+        if self.format not in EXPORT_FORMATS.values():
+            raise ValueError(f"unsupported export format for {output_path}; "
+                             f"use one of {', '.join(sorted(EXPORT_FORMATS))}")
+        self.model_version = model_version
+        self.buffer_rows = buffer_rows
+        self.rows_written = 0
+
+        self._buffer = []
+        self._file = None
+        if self.format == 'parquet':
+            # Parquet files cannot be appended to, so each flush becomes a part file
+            self.output_path.mkdir(parents=True, exist_ok=True)
+            self._schema = _parquet_schema()
+            self._part_count = len(self._parts())
+        else:
+            self.output_path.parent.mkdir(parents=True, exist_ok=True)
+            self._drop_partial_row()
+            is_new = not self.output_path.exists() or self.output_path.stat().st_size == 0
+            self._file = open(self.output_path, 'a', newline='', encoding='utf-8')
+            if self.format == 'csv':
+                self._csv = csv.writer(self._file)
+                if is_new:
+                    self._csv.writerow(EXPORT_COLUMNS)
+
+    def _parts(self):
+        return sorted(self.output_path.glob('part-*.parquet'))
+
+    def _drop_partial_row(self):
+        # A crash mid-append can leave half a row; cut the file back to its last complete line
+        if not self.output_path.exists():
+            return
+        with open(self.output_path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                step = min(64 * 1024, position)
+                position -= step
+                f.seek(position)
+                newline = f.read(step).rfind(b'\n')
+                if newline >= 0:
+                    if position + newline + 1 < end:
+                        f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def done_filenames(self):
+        """Filenames already exported by a previous run"""
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            return {name for part in self._parts()
+                    for name in pq.read_table(part, columns=['filename']).column('filename').to_pylist()}
+        if not self.output_path.exists():
+            return set()
+        with open(self.output_path, newline='', encoding='utf-8') as f:
+            if self.format == 'csv':
+                rows = csv.reader(f)
+                next(rows, None)
+                return {row[0] for row in rows if row}
+            return {json.loads(line)['filename'] for line in f if line.strip()}
+
+    def write(self, filename, image_hash, result, latency_ms):
+        """Queue one row; result is a (prediction, confidence, normal_prob, pneumonia_prob) tuple"""
+        self._buffer.append((filename, image_hash, *result, self.model_version, latency_ms))
+        if len(self._buffer) >= self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        """Durably write the buffered rows as one block"""
+        if not self._buffer:
+            return
+        if self.format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            columns = list(zip(*self._buffer))
+            table = pa.Table.from_arrays([pa.array(c, type=f.type) for c, f in zip(columns, self._schema)],
+                                         schema=self._schema)
+            part_path = self.output_path / f'part-{self._part_count:05d}.parquet'
+            tmp_path = part_path.with_suffix('.tmp')
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, part_path)
+            self._part_count += 1
+        else:
+            if self.format == 'csv':
+                self._csv.writerows(self._buffer)
+            else:
+                self._file.writelines(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self.rows_written += len(self._buffer)
+        self._buffer.clear()
+
+    def close(self):
+        """Flush the remaining rows and close the file"""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Keep whatever finished before an interruption so the next run skips it
+        self.close()
+
+
+def read_and_decode(path):
+    """Worker: (image bytes hash, grayscale array or None, decode seconds)"""
+    from preprocessing import load_grayscale
+
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        gray = load_grayscale(io.BytesIO(data))
+    except Exception as e:
+        print(f"⚠️ Could not read {path}: {e}")
+        gray = None
+    return content_hash(data), gray, time.perf_counter() - start
+
+
+def export_directory(input_dir, output_path, engine='fp32', model_path=None, batch_size=32, workers=None,
+                     buffer_rows=1024):
+    """Score the images under input_dir not yet in output_path and stream their rows; returns the row count"""
+    # Imported here so --synthetic runs never import torch
+    import numpy as np
+    from batch_score import iter_decoded_batches, iter_images
+    from inference import load_engine, normalize_gray_batch, predict_tensors
+
+    version = model_version(engine, model_path)
+    input_dir = Path(input_dir)
+    failed = (None, None, None, None)
+
+    with PredictionExporter(output_path, version, buffer_rows) as exporter, \
+            ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        done = exporter.done_filenames()
+        if done:
+            print(f"⏩ Resuming: {len(done):,} images already exported")
+        model, device = load_engine(engine, model_path)
+        pending = (p for p in iter_images(input_dir) if p not in done)
+        for paths, decoded in iter_decoded_batches(input_dir, pending, batch_size, pool, decode=read_and_decode):
+            ok = [i for i, (_, gray, _) in enumerate(decoded) if gray is not None]
+            results = {}
+            forward_seconds = 0.0
+            if ok:
+                start = time.perf_counter()
+                predictions = predict_tensors(normalize_gray_batch(np.stack([decoded[i][1] for i in ok])),
+                                              model, device)
+                forward_seconds = time.perf_counter() - start
+                results = dict(zip(ok, predictions))
+            # Latency = the image's own read and decode plus its share of the batch forward pass
+            share = forward_seconds / len(ok) if ok else 0.0
+            for i, (path, (image_hash, _, decode_seconds)) in enumerate(zip(paths, decoded)):
+                latency_ms = 1000 * (decode_seconds + (share if i in results else 0.0))
+                exporter.write(path, image_hash, results.get(i, failed), latency_ms)
+    return exporter.rows_written
+
+
+def _peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def export_synthetic(output_path, rows, buffer_rows=1024):
+    """Stream rows of fake predictions to a new file, printing peak RSS as the file grows"""
+    output_path = Path(output_path)
+    if output_path.is_dir():
+        shutil.rmtree(output_path)
+    else:
+        output_path.unlink(missing_ok=True)
+    with PredictionExporter(output_path, 'synthetic', buffer_rows) as exporter:
+        checkpoints = {rows // 100, rows // 10, rows}
+        for n in range(1, rows + 1):
+            pneumonia_prob = (n * 7919 % 10000) / 100
+            prediction = 'Pneumonia' if pneumonia_prob >= 50 else 'Normal'
+            exporter.write(f"image_{n:07d}.jpeg", content_hash(n.to_bytes(8, 'little')),
+                           (prediction, max(pneumonia_prob, 100 - pneumonia_prob), 100 - pneumonia_prob,
+                            pneumonia_prob), 12.5)
+            if n in checkpoints:
+                print(f"   {n:>9,} rows | peak RSS {_peak_rss_mib():6.1f} MiB")
+    return exporter.rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream per-image predictions to CSV, JSON Lines or Parquet")
+    parser.add_argument('input_dir', nargs='?', help="Directory of images to score")
+    parser.add_argument('output', help="Export file: .csv, .jsonl, or .parquet for a directory of part files")
+    parser.add_argument('--engine', choices=ENGINES, default='fp32', help="Inference engine")
+    parser.add_argument('--model-path', help="Weights for the engine (default: models/ file for --engine)")
+    parser.add_argument('--batch-size', type=int, default=32, help="Images per forward pass")
+    parser.add_argument('--workers', type=int, default=None, help="Decode threads (default: CPU count)")
+    parser.add_argument('--buffer-rows', type=int, default=1024, help="Rows buffered between writes")
+    parser.add_argument('--synthetic', type=int, metavar='N',
+                        help="Write N fake rows instead of scoring images, to check memory stays flat")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.synthetic:
+        print(f"📋 Writing {args.synthetic:,} synthetic rows to {args.output}")
+        count = export_synthetic(args.output, args.synthetic, args.buffer_rows)
+    else:
+        if not args.input_dir:
+            parser.error("input_dir is required unless --synthetic is given")
+        if args.model_path is None and ENGINE_WEIGHTS[args.engine] == MODEL_PATH:
+            from download_model import download_model
+            if not download_model():
+                raise SystemExit(1)
+        count = export_directory(args.input_dir, args.output, args.engine, args.model_path,
+                                 args.batch_size, args.workers, args.buffer_rows)
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count:,} rows in {elapsed:.1f} s ({count / elapsed if elapsed else 0:,.0f} rows/s), "
+          f"peak RSS {_peak_rss_mib():.1f} MiB")
+    print(f"📄 Predictions written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+═══════════════════════════════════════════════════════════════
+PREPROCESSING - Grayscale, Batch-Wise Image Preparation
+═══════════════════════════════════════════════════════════════
+Chest X-rays are single-channel, but the torchvision pipeline
+converts them to RGB first and then resizes, scales and normalizes
+three identical channels one image at a time. Here each image is
+decoded straight to uint8 grayscale and resized on one channel;
+scaling, ImageNet normalization and the 3-channel broadcast then
+happen in a single vectorized step over the whole batch.
+
+JPEGs are decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8
+in the DCT domain, so a 2000+ px radiograph is decoded at roughly
+250-500 px instead of full resolution before the final resize.
+
+Without draft mode, grayscale inputs match inference.transform to
+float rounding. Run this file to time the paths and check that
+draft decoding leaves predictions unchanged:
+    python app/preprocessing.py data/chest_xray/test
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import time
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = 224
+IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# ToTensor's /255 and Normalize folded into one multiply-add per channel
+NORM_SCALE = (1.0 / (255.0 * IMAGENET_STD)).reshape(1, 3, 1, 1)
+NORM_BIAS = (-IMAGENET_MEAN / IMAGENET_STD).reshape(1, 3, 1, 1)
+
+
+def to_grayscale(image, size=IMAGE_SIZE, draft=True):
+    """Resize a PIL image on a single channel; returns a (size, size) uint8 array"""
+    if draft:
+        # Only takes effect on JPEGs that have not been decoded yet
+        image.draft('L', (size, size))
+    if image.mode != 'L':
+        image = image.convert('L')
+    return np.asarray(image.resize((size, size), Image.BILINEAR))
+
+
+def load_grayscale(source, size=IMAGE_SIZE, draft=True):
+    """Decode a path or file-like object straight to a (size, size) uint8 array"""
+    with Image.open(source) as image:
+        return to_grayscale(image, size, draft)
+
+
+def load_display_image(source, max_size=1024):
+    """RGB image for on-screen display, decoded near max_size instead of full resolution"""
+    image = Image.open(source)
+    image.draft('RGB', (max_size, max_size))
+    return image.convert('RGB')
+
+
+def normalize_batch(gray_batch):
+    """(N, H, W) uint8 -> normalized (N, 3, H, W) float32, written once into the output"""
+    gray = np.asarray(gray_batch)[:, None]
+    out = np.multiply(gray, NORM_SCALE, dtype=np.float32)
+    out += NORM_BIAS
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare grayscale batch preprocessing with the torchvision transform")
+    parser.add_argument('image_dir', help="Directory of X-ray images")
+    parser.add_argument('--limit', type=int, default=64, help="Number of images to use")
+    parser.add_argument('--model-path', help="Weights for the prediction check (default: models/best_model.pth)")
+    args = parser.parse_args()
+
+    import torch
+    from batch_score import find_images
+    from inference import MODEL_PATH, load_weights, normalize_gray_batch, predict_tensors, transform
+
+    paths = [f"{args.image_dir}/{p}" for p in find_images(args.image_dir)[:args.limit]]
+
+    start = time.perf_counter()
+    reference = torch.stack([transform(Image.open(p).convert('RGB')) for p in paths])
+    torchvision_ms = 1000 * (time.perf_counter() - start) / len(paths)
+
+    start = time.perf_counter()
+    full = normalize_gray_batch(np.stack([load_grayscale(p, draft=False) for p in paths]))
+    full_ms = 1000 * (time.perf_counter() - start) / len(paths)
+
+    start = time.perf_counter()
+    drafted = normalize_gray_batch(np.stack([load_grayscale(p) for p in paths]))
+    draft_ms = 1000 * (time.perf_counter() - start) / len(paths)
+
+    print(f"📸 {len(paths)} images")
+    print(f"   torchvision transform:  {torchvision_ms:.2f} ms/image")
+    print(f"   grayscale, full decode: {full_ms:.2f} ms/image ({torchvision_ms / full_ms:.2f}x) | "
+          f"max abs difference {(full - reference).abs().max().item():.2e}")
+    print(f"   grayscale, draft mode:  {draft_ms:.2f} ms/image ({torchvision_ms / draft_ms:.2f}x) | "
+          f"mean abs difference {(drafted - reference).abs().mean().item():.2e}")
+
+    model, device = load_weights(args.model_path or MODEL_PATH)
+    full_results = predict_tensors(full, model, device)
+    draft_results = predict_tensors(drafted, model, device)
+    agree = sum(f[0] == d[0] for f, d in zip(full_results, draft_results))
+    max_diff = max(abs(f[3] - d[3]) for f, d in zip(full_results, draft_results))
+    print(f"🔍 Draft vs full decode: {agree}/{len(paths)} predictions agree | "
+          f"max pneumonia probability difference {max_diff:.2f} pts")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+═══════════════════════════════════════════════════════════════
+INT8 QUANTIZATION - Quantized CPU Inference Engine
+═══════════════════════════════════════════════════════════════
+Builds an int8 version of the trained model for faster CPU serving:
+    - static:  conv/bn/relu fused, activations calibrated on a
+               sample of training images (quantizes the conv stack)
+    - dynamic: int8 weights for the Linear head only (no calibration)
+
+Running this file calibrates, saves the quantized weights next to
+the fp32 model and reports accuracy and latency against fp32.
+
+Usage:
+    python app/quantization.py --calibration-dir data/chest_xray/train --eval-dir data/chest_xray/test
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import random
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.ao.quantization import convert, fuse_modules, get_default_qconfig, prepare, quantize_dynamic
+from torchvision.models import quantization as quantized_models
+
+from batch_score import find_images, label_for, load_and_preprocess
+from engines import MODEL_PATH, QUANTIZED_MODEL_PATH
+from inference import build_model, load_weights, normalize_gray_batch, predict_tensors
+
+
+def build_quantizable_model():
+    """Quantization-ready ResNet-18 (quant/dequant stubs) with the training head"""
+    model = quantized_models.resnet18(weights=None, quantize=False)
+    num_features = model.fc.in_features
+    model.fc = nn.Sequential(
+        nn.Dropout(0.5),
+        nn.Linear(num_features, 128),
+        nn.ReLU(),
+        nn.Dropout(0.3),
+        nn.Linear(128, 2)
+    )
+    return model
+
+
+def _prepare_static(model):
+    """Fuse layers and insert observers; the model must be in eval mode"""
+    model.fuse_model()
+    fuse_modules(model.fc, [['1', '2']], inplace=True)
+    model.qconfig = get_default_qconfig(torch.backends.quantized.engine)
+    return prepare(model)
+
+
+def quantize_static(state_dict, calibration_batches):
+    """Post-training static int8 quantization calibrated on preprocessed image batches"""
+    model = build_quantizable_model()
+    model.load_state_dict(state_dict)
+    model.eval()
+    model = _prepare_static(model)
+    with torch.no_grad():
+        for img_tensor in calibration_batches:
+            model(img_tensor)
+    return convert(model)
+
+
+def quantize_dynamic_head(model):
+    """Dynamic int8 quantization; only the Linear head is quantized"""
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def save_quantized_model(model, mode, path=QUANTIZED_MODEL_PATH):
+    """Save quantized weights with the mode needed to rebuild them"""
+    torch.save({'mode': mode, 'state_dict': model.state_dict()}, path)
+
+
+def load_quantized_model(path=QUANTIZED_MODEL_PATH):
+    """Rebuild the quantized graph and load int8 weights saved by save_quantized_model"""
+    device = torch.device('cpu')
+    checkpoint = torch.load(path, map_location=device)
+    if checkpoint['mode'] == 'static':
+        model = build_quantizable_model()
+        model.eval()
+        with warnings.catch_warnings():
+            # Observers are never run here; the calibrated qparams come from the state dict
+            warnings.simplefilter('ignore', UserWarning)
+            model = convert(_prepare_static(model))
+    else:
+        model = quantize_dynamic_head(build_model().eval())
+    model.load_state_dict(checkpoint['state_dict'])
+    model.eval()
+    return model, device
+
+
+def _load_tensors(paths, batch_size):
+    """Yield preprocessed batches for a list of image paths"""
+    for start in range(0, len(paths), batch_size):
+        decoded = [load_and_preprocess(p)[0] for p in paths[start:start + batch_size]]
+        decoded = [gray for gray in decoded if gray is not None]
+        if decoded:
+            yield normalize_gray_batch(np.stack(decoded))
+
+
+def evaluate_accuracy(model, device, data_dir, batch_size=32):
+    """Accuracy (%) and mean ms/image on a NORMAL/PNEUMONIA held-out directory"""
+    data_dir = Path(data_dir)
+    paths = [p for p in find_images(data_dir) if label_for(p)]
+    correct = total = 0
+    elapsed = 0.0
+    for start in range(0, len(paths), batch_size):
+        chunk = paths[start:start + batch_size]
+        decoded = [(load_and_preprocess(data_dir / p)[0], label_for(p)) for p in chunk]
+        decoded = [(gray, label) for gray, label in decoded if gray is not None]
+        if not decoded:
+            continue
+        img_tensor = normalize_gray_batch(np.stack([gray for gray, _ in decoded]))
+        t0 = time.perf_counter()
+        results = predict_tensors(img_tensor, model, device)
+        elapsed += time.perf_counter() - t0
+        correct += sum(r[0] == label for r, (_, label) in zip(results, decoded))
+        total += len(decoded)
+    if not total:
+        raise ValueError(f"No labelled images found under {data_dir}")
+    return 100 * correct / total, 1000 * elapsed / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and validate the int8 quantized model")
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static')
+    parser.add_argument('--model-path', default=MODEL_PATH, help="fp32 weights (default: %(default)s)")
+    parser.add_argument('--output', default=QUANTIZED_MODEL_PATH, help="int8 weights (default: %(default)s)")
+    parser.add_argument('--calibration-dir', help="Training images used to calibrate static quantization")
+    parser.add_argument('--calibration-size', type=int, default=256, help="Images sampled for calibration")
+    parser.add_argument('--eval-dir', help="Held-out NORMAL/PNEUMONIA directory for the accuracy check")
+    parser.add_argument('--batch-size', type=int, default=32)
+    args = parser.parse_args()
+
+    fp32_model, device = load_weights(args.model_path)
+
+    if args.mode == 'static':
+        if not args.calibration_dir:
+            parser.error("--calibration-dir is required for static quantization")
+        calibration_dir = Path(args.calibration_dir)
+        paths = find_images(calibration_dir)
+        random.Random(0).shuffle(paths)
+        paths = [calibration_dir / p for p in paths[:args.calibration_size]]
+        print(f"🎯 Calibrating on {len(paths)} images from {calibration_dir}")
+        int8_model = quantize_static(fp32_model.state_dict(), _load_tensors(paths, args.batch_size))
+    else:
+        int8_model = quantize_dynamic_head(fp32_model)
+
+    save_quantized_model(int8_model, args.mode, args.output)
+    print(f"💾 Saved {args.mode} int8 model to {args.output}")
+
+    if args.eval_dir:
+        fp32_acc, fp32_ms = evaluate_accuracy(fp32_model, device, args.eval_dir, args.batch_size)
+        int8_acc, int8_ms = evaluate_accuracy(int8_model, device, args.eval_dir, args.batch_size)
+        print("=" * 70)
+        print(f"   fp32: accuracy {fp32_acc:.2f}% | {fp32_ms:.2f} ms/image")
+        print(f"   int8: accuracy {int8_acc:.2f}% | {int8_ms:.2f} ms/image")
+        print(f"   Δ accuracy: {int8_acc - fp32_acc:+.2f} pts | speed-up: {fp32_ms / int8_ms:.2f}x")
+        print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+═══════════════════════════════════════════════════════════════
+REPORT CACHE - Memoized PDF Reports
+═══════════════════════════════════════════════════════════════
+Finished PDF reports keyed by a digest of everything that goes
+into them: patient fields, risk score and category, the AI
+prediction and a hash of the uploaded X-ray. Reruns with the same
+inputs serve the stored bytes instead of rebuilding the document.
+═══════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+
+def report_key(patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+               is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+               prediction=None, confidence=None, image_hash=None):
+    """SHA-256 digest of all report inputs plus today's date (printed as the assessment date)
+
+    image_hash is inference_cache.content_hash of the uploaded X-ray, if any.
+    """
+    fields = [
+        patient_name, age, gender, has_fever, has_cough, has_breathing_difficulty,
+        is_smoker, has_chronic_condition, symptom_days, risk_score, risk_category,
+        prediction, confidence, image_hash,
+        date.today().isoformat(),
+    ]
+    return hashlib.sha256(json.dumps(fields, default=str).encode('utf-8')).hexdigest()
+
+
+class ReportCache:
+    """Bounded LRU cache of rendered PDF bytes"""
+
+    def __init__(self, max_entries=32):
+        """
+        Args:
+            max_entries (int): Maximum number of reports kept in memory
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached PDF bytes for a key, or None on a miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, pdf_bytes):
+        """Store PDF bytes, evicting the least recently used report when full"""
+        with self._lock:
+            self._entries[key] = pdf_bytes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key, build):
+        """Return the cached PDF bytes for key, calling build() (a BytesIO or bytes) on a miss"""
+        pdf_bytes = self.get(key)
+        if pdf_bytes is None:
+            pdf_bytes = build()
+            if hasattr(pdf_bytes, 'getvalue'):
+                pdf_bytes = pdf_bytes.getvalue()
+            self.put(key, pdf_bytes)
+        return pdf_bytes
+
+    def clear(self):
+        """Drop all reports and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,342 @@
+"""
+═══════════════════════════════════════════════════════════════
+RISK ENGINE - Configurable, Table-Driven Clinical Risk Scoring
+═══════════════════════════════════════════════════════════════
+Loads the clinical risk weights and category cutoffs from a JSON
+rules file (risk_rules.json next to this module, or the path in
+PNEUMONIA_RISK_RULES) and compiles them into a score table indexed
+by age band x symptom bitmask x duration band. The table is there
+so that any rule file, whatever its bands, scores through the same
+few lookups; it is not a speed-up over the hard-coded rules, which
+it matches in throughput.
+
+The rules file is re-read when it changes on disk, so edited rules
+take effect on the next Streamlit rerun without a restart. A file
+that fails to load leaves the previous rules in place. The app's
+list of contributing factors comes from the same rules, so it
+always agrees with the score shown.
+
+The shipped rules reproduce clinical_risk.calculate_clinical_risk
+exactly. Run this file to check that and compare throughput:
+    python app/risk_engine.py
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+RULES_PATH = Path(__file__).resolve().with_name('risk_rules.json')
+SYMPTOM_COLUMNS = ['has_fever', 'has_cough', 'has_breathing_difficulty', 'is_smoker', 'has_chronic_condition']
+SYMPTOM_LABELS = {
+    'has_fever': 'Fever present',
+    'has_cough': 'Persistent cough',
+    'has_breathing_difficulty': 'Dyspnea',
+    'is_smoker': 'Smoking history',
+    'has_chronic_condition': 'Chronic lung disease',
+}
+# The app's progress bar and gauge are drawn on a 0-100 scale
+SCORE_LIMIT = 100
+# Whole ages and durations up to these bounds are banded by lookup; anything else evaluates the rules
+MAX_AGE = 150
+MAX_SYMPTOM_DAYS = 365
+
+
+def _matches(rule, value):
+    return value > rule['above'] if 'above' in rule else value < rule['below']
+
+
+def _band(value, bands):
+    """Index of the first band whose condition holds (len(bands) if none), like an if/elif chain"""
+    for i, rule in enumerate(bands):
+        if _matches(rule, value):
+            return i
+    return len(bands)
+
+
+def _band_batch(values, bands):
+    """_band over an array, applying the rules last to first so the first match wins"""
+    index = np.full(values.shape, len(bands), dtype=np.intp)
+    for i in reversed(range(len(bands))):
+        index[_matches(bands[i], values)] = i
+    return index
+
+
+def _check_bands(name, bands):
+    for rule in bands:
+        if len({'above', 'below'} & rule.keys()) != 1 or 'points' not in rule:
+            raise ValueError(f"{name}: each band needs 'points' and exactly one of 'above' / 'below': {rule}")
+        if rule['points'] < 0:
+            raise ValueError(f"{name}: points must not be negative: {rule}")
+        if not isinstance(rule.get('label', ''), str):
+            raise ValueError(f"{name}: label must be a string: {rule}")
+
+
+def _band_label(rule, default, unit=''):
+    """e.g. 'Advanced age (>65)' or 'Prolonged symptoms (>7 days)'"""
+    condition = f">{rule['above']}" if 'above' in rule else f"<{rule['below']}"
+    return f"{rule.get('label', default)} ({condition}{unit})"
+
+
+def load_rules(path=RULES_PATH):
+    """Read and validate a rules file; raises ValueError describing the first problem"""
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    for key in ['age_bands', 'symptom_points', 'duration_bands', 'max_score', 'categories']:
+        if key not in rules:
+            raise ValueError(f"risk rules are missing '{key}'")
+    _check_bands('age_bands', rules['age_bands'])
+    _check_bands('duration_bands', rules['duration_bands'])
+    missing = [c for c in SYMPTOM_COLUMNS if c not in rules['symptom_points']]
+    if missing:
+        raise ValueError(f"symptom_points is missing {', '.join(missing)}")
+    if any(rules['symptom_points'][c] < 0 for c in SYMPTOM_COLUMNS):
+        raise ValueError("symptom_points must not be negative")
+    if not 0 < rules['max_score'] <= SCORE_LIMIT:
+        raise ValueError(f"max_score must be between 1 and {SCORE_LIMIT}, got {rules['max_score']}")
+
+    categories = rules['categories']
+    if not categories or 'below' in categories[-1] or any('below' not in c for c in categories[:-1]):
+        raise ValueError("categories need a 'below' cutoff on every entry except the last")
+    cutoffs = [c['below'] for c in categories[:-1]]
+    if cutoffs != sorted(cutoffs):
+        raise ValueError("category cutoffs must be in increasing order")
+    return rules
+
+
+class RiskTable:
+    """Risk rules compiled to a score table indexed by age band x symptom bitmask x duration band"""
+
+    def __init__(self, rules):
+        """
+        Args:
+            rules (dict): Validated rules, as returned by load_rules()
+        """
+        self.rules = rules
+        self.age_bands = rules['age_bands']
+        self.duration_bands = rules['duration_bands']
+
+        age_points = np.array([b['points'] for b in self.age_bands] + [0])
+        duration_points = np.array([b['points'] for b in self.duration_bands] + [0])
+        symptom_points = [rules['symptom_points'][c] for c in SYMPTOM_COLUMNS]
+        mask_points = np.array([sum(p for i, p in enumerate(symptom_points) if mask >> i & 1)
+                                for mask in range(1 << len(SYMPTOM_COLUMNS))])
+        raw = age_points[:, None, None] + mask_points[None, :, None] + duration_points[None, None, :]
+        self.table = np.minimum(raw, rules['max_score'])
+
+        self.age_band_lut = np.array([_band(age, self.age_bands) for age in range(MAX_AGE + 1)])
+        self.duration_band_lut = np.array([_band(days, self.duration_bands) for days in range(MAX_SYMPTOM_DAYS + 1)])
+
+        categories = rules['categories']
+        self.max_score = rules['max_score']
+        self.category_cutoffs = [c['below'] for c in categories[:-1]]
+        self.category_names = np.array([c['name'] for c in categories])
+        self.category_icons = np.array([c['icon'] for c in categories])
+        # Category of every whole score from 0 to max_score, first entry whose cutoff the score is below
+        category_index = np.searchsorted(self.category_cutoffs, np.arange(math.floor(self.max_score) + 1),
+                                         side='right')
+
+        # Flat Python lists are faster than NumPy indexing for one-at-a-time lookups
+        self._scores = self.table.ravel().tolist()
+        self._mask_count = self.table.shape[1]
+        self._duration_count = self.table.shape[2]
+        self._age_bands = self.age_band_lut.tolist()
+        self._duration_bands = self.duration_band_lut.tolist()
+        self._categories = list(zip(self.category_names[category_index].tolist(),
+                                    self.category_icons[category_index].tolist()))
+
+    def calculate_clinical_risk(self, age, has_fever, has_cough, has_breathing_difficulty,
+                                is_smoker, has_chronic_condition, symptom_days):
+        """Risk score of one patient by table lookup"""
+        mask = ((has_fever and 1) | (has_cough and 2) | (has_breathing_difficulty and 4)
+                | (is_smoker and 8) | (has_chronic_condition and 16))
+        if age.__class__ is int and 0 <= age <= MAX_AGE:
+            age_band = self._age_bands[age]
+        else:
+            age_band = _band(age, self.age_bands)
+        if symptom_days.__class__ is int and 0 <= symptom_days <= MAX_SYMPTOM_DAYS:
+            duration_band = self._duration_bands[symptom_days]
+        else:
+            duration_band = _band(symptom_days, self.duration_bands)
+        return self._scores[(age_band * self._mask_count + mask) * self._duration_count + duration_band]
+
+    def get_risk_category(self, risk_score):
+        """(category, icon) of a score; other numbers are clamped to 0..max_score first"""
+        if risk_score.__class__ is int and 0 <= risk_score < len(self._categories):
+            return self._categories[risk_score]
+        score = float(risk_score)
+        if math.isnan(score):
+            raise ValueError("risk score is NaN")
+        score = min(max(score, 0), self.max_score)
+        index = int(np.searchsorted(self.category_cutoffs, score, side='right'))
+        return self.category_names[index].item(), self.category_icons[index].item()
+
+    def contributing_factors(self, age, has_fever, has_cough, has_breathing_difficulty,
+                             is_smoker, has_chronic_condition, symptom_days):
+        """(label, points) of every rule that adds points for this patient, in rule order"""
+        factors = []
+        age_band = _band(age, self.age_bands)
+        if age_band < len(self.age_bands):
+            factors.append((_band_label(self.age_bands[age_band], 'Age'), self.age_bands[age_band]['points']))
+        flags = [has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]
+        for column, flag in zip(SYMPTOM_COLUMNS, flags):
+            if flag:
+                factors.append((SYMPTOM_LABELS[column], self.rules['symptom_points'][column]))
+        duration_band = _band(symptom_days, self.duration_bands)
+        if duration_band < len(self.duration_bands):
+            rule = self.duration_bands[duration_band]
+            factors.append((_band_label(rule, 'Symptom duration', ' days'), rule['points']))
+        return [(label, points) for label, points in factors if points > 0]
+
+    def calculate_clinical_risk_batch(self, age, has_fever, has_cough, has_breathing_difficulty,
+                                      is_smoker, has_chronic_condition, symptom_days):
+        """Risk scores of a cohort: band and bitmask arrays, then one gather from the table"""
+        mask = np.zeros(np.shape(age), dtype=np.intp)
+        for bit, flag in enumerate([has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]):
+            mask |= np.asarray(flag, dtype=bool).astype(np.intp) << bit
+        age_band = _band_batch(np.asarray(age), self.age_bands)
+        duration_band = _band_batch(np.asarray(symptom_days), self.duration_bands)
+        return self.table[age_band, mask, duration_band]
+
+    def get_risk_category_batch(self, risk_scores):
+        """(categories, icons) arrays for an array of scores, clamped to 0..max_score"""
+        scores = np.clip(np.asarray(risk_scores, dtype=float), 0, self.max_score)
+        index = np.searchsorted(self.category_cutoffs, scores, side='right')
+        return self.category_names[index], self.category_icons[index]
+
+
+class RiskEngine:
+    """RiskTable for a rules file, recompiled whenever the file changes"""
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str): Rules file (default: PNEUMONIA_RISK_RULES, else risk_rules.json)
+        """
+        self.path = Path(path or os.environ.get('PNEUMONIA_RISK_RULES') or RULES_PATH)
+        self.table = None
+        self.last_error = None
+        self._signature = None
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Compile the rules file now; keeps the previous table if it cannot be loaded"""
+        with self._lock:
+            try:
+                signature = self._file_signature()
+                table = RiskTable(load_rules(self.path))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if self.table is None:
+                    raise
+                self.last_error = str(e)
+                print(f"⚠️ Keeping previous risk rules; could not load {self.path}: {e}")
+                return False
+            self.table = table
+            self._signature = signature
+            self.last_error = None
+            return True
+
+    def maybe_reload(self):
+        """Recompile if the rules file changed since the last load; returns True if it did"""
+        try:
+            signature = self._file_signature()
+        except OSError:
+            return False
+        if signature == self._signature:
+            return False
+        # Recorded up front so a broken file is reported once, not on every call
+        self._signature = signature
+        return self.reload()
+
+    # Delegates to the current table; hot loops can hold engine.table to skip a call level
+    def calculate_clinical_risk(self, *args):
+        return self.table.calculate_clinical_risk(*args)
+
+    def get_risk_category(self, risk_score):
+        return self.table.get_risk_category(risk_score)
+
+    def contributing_factors(self, *args):
+        return self.table.contributing_factors(*args)
+
+    def calculate_clinical_risk_batch(self, *args):
+        return self.table.calculate_clinical_risk_batch(*args)
+
+    def get_risk_category_batch(self, risk_scores):
+        return self.table.get_risk_category_batch(risk_scores)
+
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+
+def get_risk_engine():
+    """Process-wide engine, checked for edited rules on every call"""
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = RiskEngine()
+            return _default_engine
+    _default_engine.maybe_reload()
+    return _default_engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the compiled risk table against the built-in rules")
+    parser.add_argument('--rules', help="Rules file (default: risk_rules.json)")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Cohort size for the batch benchmark")
+    args = parser.parse_args()
+
+    from clinical_risk import (RISK_FACTOR_COLUMNS, calculate_clinical_risk, calculate_clinical_risk_batch,
+                               get_risk_category, random_cohort)
+
+    engine = RiskEngine(args.rules)
+    print(f"📋 {engine.path}: table of {engine.table.table.shape[0]} age bands x "
+          f"{engine.table.table.shape[1]} symptom masks x {engine.table.table.shape[2]} duration bands")
+
+    mismatches = 0
+    checked = 0
+    for age in [x / 2 for x in range(0, 2 * 111)]:
+        for mask in range(32):
+            flags = [bool(mask >> i & 1) for i in range(5)]
+            for days in range(0, 31):
+                checked += 1
+                expected = calculate_clinical_risk(age, *flags, days)
+                got = engine.calculate_clinical_risk(age, *flags, days)
+                if got != expected or engine.get_risk_category(got) != get_risk_category(expected):
+                    mismatches += 1
+    if mismatches:
+        print(f"⚠️ {mismatches:,} of {checked:,} combinations differ from clinical_risk.calculate_clinical_risk")
+    else:
+        print(f"✅ Matches clinical_risk.calculate_clinical_risk on all {checked:,} combinations")
+
+    cohort = random_cohort(args.rows)
+    columns = [cohort[c] for c in RISK_FACTOR_COLUMNS]
+    rows = [[c[i].item() for c in columns] for i in range(min(100_000, args.rows))]
+    timings = {}
+    for name, score in [('rules', calculate_clinical_risk), ('table', engine.table.calculate_clinical_risk)]:
+        start = time.perf_counter()
+        for row in rows:
+            score(*row)
+        timings[name] = len(rows) / (time.perf_counter() - start)
+    for name, score in [('rules', calculate_clinical_risk_batch), ('table', engine.calculate_clinical_risk_batch)]:
+        start = time.perf_counter()
+        score(*columns)
+        timings[f'{name} batch'] = args.rows / (time.perf_counter() - start)
+    # The table trades no speed for configurable rules; these should be roughly equal
+    print("⏱️ " + " | ".join(f"{name}: {rate:,.0f} rows/s" for name, rate in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
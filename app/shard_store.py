@@ -0,0 +1,204 @@
+"""
+═══════════════════════════════════════════════════════════════
+SHARD STORE - Decode-Once Training Data in Memory-Mapped Shards
+═══════════════════════════════════════════════════════════════
+The notebook's ChestXRayDataset opens and decodes every JPEG on
+every epoch. Ingestion does that work once: each image is decoded,
+resized to 224x224 grayscale and written into fixed-size uint8
+.npy shards (50 KiB per image), with the labels and source paths
+in a manifest. ShardDataset memory-maps the shards, so an item is
+a view into the page cache: no JPEG decode, no read() copy, and
+the OS shares the pages between DataLoader workers.
+
+Images are stored single-channel; the three identical RGB channels
+and the ImageNet normalization are produced per batch by
+inference.normalize_gray_batch (see preprocessing.py), which
+matches the notebook's transforms to float rounding. Augmentation
+runs on the uint8 tensors, after the shard read.
+
+Usage:
+    python app/shard_store.py ingest data/chest_xray/train data/shards/train
+    python app/shard_store.py benchmark data/chest_xray/train data/shards/train
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from torchvision import transforms
+
+from batch_score import find_images, label_for
+from inference import CLASS_NAMES
+from preprocessing import IMAGE_SIZE, load_grayscale
+
+MANIFEST_NAME = 'manifest.json'
+SHARD_SIZE = 4096
+
+# The notebook's training augmentation, applied to (1, H, W) uint8 tensors from the store
+TRAIN_AUGMENT = transforms.Compose([
+    transforms.RandomHorizontalFlip(p=0.5),
+    transforms.RandomRotation(10),
+    transforms.ColorJitter(brightness=0.2, contrast=0.2),
+])
+
+
+def _decode(path):
+    # Full decode, not draft mode: training should see the same pixels as the notebook's Resize
+    return load_grayscale(path, draft=False)
+
+
+def ingest(image_dir, store_dir, shard_size=SHARD_SIZE, workers=None, chunk_size=256):
+    """Decode every labelled image under image_dir into uint8 shards; returns the manifest"""
+    image_dir = Path(image_dir)
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # A store is complete once its manifest exists; an interrupted ingest leaves none
+    manifest_path = store_dir / MANIFEST_NAME
+    manifest_path.unlink(missing_ok=True)
+
+    paths = [p for p in find_images(image_dir) if label_for(p)]
+    if not paths:
+        raise ValueError(f"No NORMAL/PNEUMONIA images found under {image_dir}")
+    labels = [CLASS_NAMES.index(label_for(p)) for p in paths]
+
+    shards = []
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for shard_start in range(0, len(paths), shard_size):
+            shard_paths = paths[shard_start:shard_start + shard_size]
+            name = f"shard-{len(shards):05d}.npy"
+            tmp_path = store_dir / f"{name}.tmp"
+            shard = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8,
+                                              shape=(len(shard_paths), IMAGE_SIZE, IMAGE_SIZE))
+            for start in range(0, len(shard_paths), chunk_size):
+                chunk = shard_paths[start:start + chunk_size]
+                for i, gray in enumerate(pool.map(_decode, [image_dir / p for p in chunk]), start):
+                    shard[i] = gray
+            shard.flush()
+            del shard
+            os.replace(tmp_path, store_dir / name)
+            shards.append({'file': name, 'count': len(shard_paths)})
+
+    manifest = {
+        'image_size': IMAGE_SIZE,
+        'shard_size': shard_size,
+        'count': len(paths),
+        'class_names': CLASS_NAMES,
+        'shards': shards,
+        'labels': labels,
+        'paths': paths,
+    }
+    tmp_path = store_dir / f"{MANIFEST_NAME}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+class ShardDataset(Dataset):
+    """(image, label) items read from a shard store without decoding or copying"""
+
+    def __init__(self, store_dir, transform=None):
+        """
+        Args:
+            store_dir (str): Directory written by ingest()
+            transform (callable): Optional transform of the (1, H, W) uint8 image tensor
+        """
+        self.store_dir = Path(store_dir)
+        self.transform = transform
+        manifest_path = self.store_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            raise FileNotFoundError(f"No shard store at {store_dir}; run: python app/shard_store.py ingest ...")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.shard_size = manifest['shard_size']
+        self.shard_files = [shard['file'] for shard in manifest['shards']]
+        self.labels = manifest['labels']
+        self.paths = manifest['paths']
+        self._shards = None
+
+    def _open(self):
+        # Copy-on-write maps: torch needs writable arrays, and pages are only copied if a transform writes
+        return [np.load(self.store_dir / name, mmap_mode='c') for name in self.shard_files]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        if self._shards is None:
+            # Opened lazily so each DataLoader worker maps the files itself
+            self._shards = self._open()
+        image = torch.from_numpy(self._shards[idx // self.shard_size][idx % self.shard_size]).unsqueeze(0)
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+    def __getstate__(self):
+        # Memory maps are not picklable; spawned workers reopen them on first access
+        state = self.__dict__.copy()
+        state['_shards'] = None
+        return state
+
+
+def _benchmark(image_dir, store_dir, limit):
+    """Items/sec of the notebook's JPEG dataset path vs the shard store, both normalized"""
+    from PIL import Image
+    from inference import normalize_gray_batch, transform
+
+    dataset = ShardDataset(store_dir)
+    count = min(limit, len(dataset))
+
+    start = time.perf_counter()
+    for path in dataset.paths[:count]:
+        transform(Image.open(Path(image_dir) / path).convert('RGB'))
+    jpeg_rate = count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for idx in range(count):
+        image, _ = dataset[idx]
+        normalize_gray_batch(image)
+    shard_rate = count / (time.perf_counter() - start)
+
+    reference = transform(Image.open(Path(image_dir) / dataset.paths[0]).convert('RGB'))
+    difference = (normalize_gray_batch(dataset[0][0])[0] - reference).abs().max().item()
+    return jpeg_rate, shard_rate, difference
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode a NORMAL/PNEUMONIA image tree into memory-mapped shards")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help="Decode images into a shard store")
+    ingest_parser.add_argument('image_dir', help="Directory with NORMAL and PNEUMONIA subfolders")
+    ingest_parser.add_argument('store_dir', help="Output directory for the shards and manifest")
+    ingest_parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help="Images per shard file")
+    ingest_parser.add_argument('--workers', type=int, default=None, help="Decode threads (default: CPU count)")
+    bench_parser = subparsers.add_parser('benchmark', help="Compare JPEG decoding with shard reads")
+    bench_parser.add_argument('image_dir', help="Directory the store was ingested from")
+    bench_parser.add_argument('store_dir', help="Shard store directory")
+    bench_parser.add_argument('--limit', type=int, default=512, help="Items read per path")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        start = time.perf_counter()
+        manifest = ingest(args.image_dir, args.store_dir, args.shard_size, args.workers)
+        elapsed = time.perf_counter() - start
+        size_mib = manifest['count'] * IMAGE_SIZE * IMAGE_SIZE / 2**20
+        print(f"💾 {manifest['count']} images in {len(manifest['shards'])} shards ({size_mib:.0f} MiB) "
+              f"at {args.store_dir} in {elapsed:.1f} s")
+        for index, name in enumerate(CLASS_NAMES):
+            print(f"   - {name}: {manifest['labels'].count(index)}")
+    else:
+        jpeg_rate, shard_rate, difference = _benchmark(args.image_dir, args.store_dir, args.limit)
+        print(f"📸 JPEG decode + torchvision transform: {jpeg_rate:8.1f} images/s")
+        print(f"💾 Shard store + normalize:             {shard_rate:8.1f} images/s ({shard_rate / jpeg_rate:.1f}x)")
+        print(f"🔍 Max abs difference from the notebook's test transform: {difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
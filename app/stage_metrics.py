@@ -0,0 +1,213 @@
+"""
+═══════════════════════════════════════════════════════════════
+STAGE METRICS - Per-Stage Latency Histograms for the Hot Path
+═══════════════════════════════════════════════════════════════
+Timers around each step an X-ray goes through: reading the
+upload, decoding it, preprocessing, the forward pass, turning
+logits into a prediction, and building the PDF report. Every stage
+keeps a Prometheus histogram (cumulative buckets, sum, count) and
+a window of recent samples for p50 / p95 / p99.
+
+The numbers are served as Prometheus text by the HTTP service's
+/metrics endpoint. They are also written to the file named by
+PNEUMONIA_METRICS_FILE, at most once a second, for the node
+exporter's textfile collector. PNEUMONIA_METRICS_PANEL=1 adds a
+debug table to the Streamlit sidebar.
+
+Run this file to time the stages on an X-ray and print the output:
+    python app/stage_metrics.py data/chest_xray/test/NORMAL/IM-0001-0001.jpeg
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+STAGES = ['upload', 'decode', 'preprocess', 'forward', 'postprocess', 'pdf_build']
+# Histogram bucket upper bounds in seconds, from sub-millisecond hashing to multi-second PDF builds
+BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram plus a window of the most recent samples"""
+
+    def __init__(self, window=2048):
+        """
+        Args:
+            window (int): Recent samples kept for the quantiles
+        """
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self):
+        """{quantile: seconds} over the recent window (nearest rank)"""
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+class StageMetrics:
+    """Thread-safe latency histograms keyed by pipeline stage"""
+
+    def __init__(self, export_path=None, export_interval=1.0):
+        """
+        Args:
+            export_path (str): Optional file rewritten with the Prometheus text
+            export_interval (float): Minimum seconds between file writes
+        """
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self._histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self._lock = threading.Lock()
+        self._last_export = 0.0
+
+    def observe(self, stage, seconds):
+        """Record one duration for a stage"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.observe(seconds)
+        if self.export_path and time.monotonic() - self._last_export >= self.export_interval:
+            self.write_text_file()
+
+    @contextmanager
+    def time(self, stage):
+        """Context manager that records the time spent in its block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """{stage: {'count', 'mean', 0.5, 0.95, 0.99}} in seconds, for stages that have samples"""
+        with self._lock:
+            return {
+                stage: {'count': h.count, 'mean': h.sum / h.count, **h.quantiles()}
+                for stage, h in self._histograms.items() if h.count
+            }
+
+    def to_prometheus(self):
+        """All stages in Prometheus text exposition format"""
+        lines = [
+            '# HELP pneumonia_stage_seconds Time spent in each stage of the inference path',
+            '# TYPE pneumonia_stage_seconds histogram',
+        ]
+        quantile_lines = [
+            '# HELP pneumonia_stage_seconds_recent Latency quantiles over the recent samples of each stage',
+            '# TYPE pneumonia_stage_seconds_recent gauge',
+        ]
+        with self._lock:
+            for stage, h in self._histograms.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, h.bucket_counts):
+                    cumulative += count
+                    lines.append(f'pneumonia_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'pneumonia_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'pneumonia_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'pneumonia_stage_seconds_count{{stage="{stage}"}} {h.count}')
+                for q, seconds in h.quantiles().items():
+                    quantile_lines.append(
+                        f'pneumonia_stage_seconds_recent{{stage="{stage}",quantile="{q}"}} {seconds:.6f}'
+                    )
+        return '\n'.join(lines + quantile_lines) + '\n'
+
+    def write_text_file(self, path=None):
+        """Atomically rewrite the Prometheus text file"""
+        path = path or self.export_path
+        self._last_export = time.monotonic()
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Metrics are best effort; never fail a prediction over them
+            print(f"⚠️ Could not write metrics to {path}: {e}")
+
+    def clear(self):
+        """Drop all samples"""
+        with self._lock:
+            self._histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_stage_metrics():
+    """Process-wide metrics, exported to PNEUMONIA_METRICS_FILE when it is set"""
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = StageMetrics(os.environ.get('PNEUMONIA_METRICS_FILE'))
+        return _default_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each inference stage on an X-ray and print the metrics")
+    parser.add_argument('image', help="X-ray image file")
+    parser.add_argument('--runs', type=int, default=20, help="Passes through the pipeline")
+    parser.add_argument('--model-path', help="fp32 weights (default: models/best_model.pth)")
+    parser.add_argument('--no-pdf', action='store_true', help="Skip the PDF build stage")
+    args = parser.parse_args()
+
+    import io
+    from inference import MODEL_PATH, load_engine, normalize_gray_batch, predict_tensors
+    from inference_cache import content_hash
+    from preprocessing import load_display_image, load_grayscale
+
+    scratch = StageMetrics()
+    start = time.perf_counter()
+    for _ in range(100_000):
+        with scratch.time('upload'):
+            pass
+    overhead_us = 1e6 * (time.perf_counter() - start) / 100_000
+
+    # The instrumented modules import stage_metrics by name, not this __main__ copy of it
+    from stage_metrics import get_stage_metrics as shared_stage_metrics
+    metrics = shared_stage_metrics()
+
+    model, device = load_engine('fp32', args.model_path or MODEL_PATH)
+    for _ in range(args.runs):
+        # Same steps as analysis_state.XrayAnalysis: hash the upload, decode the preview,
+        # then draft-decode the bytes again for the model
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+        with metrics.time('upload'):
+            content_hash(image_bytes)
+        with metrics.time('decode'):
+            load_display_image(io.BytesIO(image_bytes))
+        with metrics.time('preprocess'):
+            gray = load_grayscale(io.BytesIO(image_bytes))
+        prediction, confidence, _, _ = predict_tensors(normalize_gray_batch(gray[None]), model, device)[0]
+        if not args.no_pdf:
+            from medical_report import generate_pdf_report
+            generate_pdf_report('Benchmark Patient', 50, 'Female', True, False, True, False, False, 5,
+                                55, 'MEDIUM', prediction, confidence)
+
+    print(f"⏱️ {args.runs} runs on {args.image} (timer overhead {overhead_us:.2f} µs)")
+    print(f"   {'stage':<12} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, s in metrics.snapshot().items():
+        print(f"   {stage:<12} {s['count']:>6} {1000 * s[0.5]:>9.2f} {1000 * s[0.95]:>9.2f} {1000 * s[0.99]:>9.2f}")
+    print()
+    print(metrics.to_prometheus(), end='')
+
+
+if __name__ == "__main__":
+    main()
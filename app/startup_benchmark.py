@@ -0,0 +1,92 @@
+"""
+═══════════════════════════════════════════════════════════════
+STARTUP BENCHMARK - Cold Import Time per Module
+═══════════════════════════════════════════════════════════════
+Times each heavy dependency in a fresh interpreter (so nothing is
+already cached in sys.modules), then loads the Streamlit script the
+same way and reports how long it takes and which heavy modules it
+pulls in before the first page is rendered. torch, pandas,
+matplotlib and reportlab should all be absent: they load when an
+X-ray is uploaded or a report is built.
+
+Usage:
+    python app/startup_benchmark.py --repeat 3
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent
+
+HEAVY_MODULES = [
+    'streamlit',
+    'numpy',
+    'PIL.Image',
+    'pandas',
+    'torch',
+    'torchvision',
+    'matplotlib.pyplot',
+    'reportlab.platypus',
+    'inference',
+    'medical_report',
+]
+
+_IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+# Bare-mode Streamlit warns about the missing runtime; main() is not called
+_APP_PROBE = """
+import json, runpy, sys, time, warnings
+warnings.simplefilter('ignore')
+start = time.perf_counter()
+runpy.run_path({script!r}, run_name='startup_benchmark')
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {modules!r} if m in sys.modules]}}))
+"""
+
+
+def _run_probe(code):
+    """Run a snippet in a fresh interpreter from the app directory and return its last stdout line"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def time_import(module, repeat=3):
+    """Best-of-repeat cold import time for one module, in seconds"""
+    return min(float(_run_probe(_IMPORT_PROBE.format(module=module))) for _ in range(repeat))
+
+
+def time_app_startup(repeat=3):
+    """Best-of-repeat time to execute the app's module level, and the heavy modules it imported"""
+    script = str(APP_DIR / 'pneumonia_detector.py')
+    runs = [json.loads(_run_probe(_APP_PROBE.format(script=script, modules=HEAVY_MODULES))) for _ in range(repeat)]
+    return min(r['seconds'] for r in runs), runs[0]['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import times behind the Streamlit app's startup")
+    parser.add_argument('--repeat', type=int, default=3, help="Fresh interpreters per measurement (best is kept)")
+    args = parser.parse_args()
+
+    print(f"⏱️ Cold import time (best of {args.repeat})")
+    for module in HEAVY_MODULES:
+        try:
+            print(f"   {module:<20} {1000 * time_import(module, args.repeat):8.1f} ms")
+        except subprocess.CalledProcessError:
+            print(f"   {module:<20} {'not installed':>11}")
+
+    seconds, loaded = time_app_startup(args.repeat)
+    print(f"🚀 pneumonia_detector.py module level: {1000 * seconds:.1f} ms")
+    print(f"   heavy modules loaded at startup: {', '.join(loaded)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+═══════════════════════════════════════════════════════════════
+TORCHSCRIPT ENGINE - Frozen Inference Graph with Warm-Up
+═══════════════════════════════════════════════════════════════
+Exports the trained model once to a frozen, inference-optimized
+TorchScript graph (conv/bn folded, no Python dispatch) and caches
+it next to the weights. The artifact name carries the weights
+digest, so retrained weights are re-exported automatically.
+Falls back to the eager model if export or loading fails.
+═══════════════════════════════════════════════════════════════
+"""
+
+import os
+from pathlib import Path
+
+import torch
+
+from inference import MODEL_PATH, load_weights, warmup
+from inference_cache import file_digest
+
+
+def torchscript_path(model_path=MODEL_PATH):
+    """Cached artifact location for a weights file, e.g. models/best_model.1a2b3c4d5e6f.ts.pt"""
+    model_path = Path(model_path)
+    return model_path.with_name(f"{model_path.stem}.{file_digest(model_path)[:12]}.ts.pt")
+
+
+def export_torchscript(model, path):
+    """Trace and freeze an eval-mode model, then save it atomically"""
+    example = torch.zeros(1, 3, 224, 224)
+    with torch.no_grad():
+        frozen = torch.jit.freeze(torch.jit.trace(model, example))
+    tmp_path = f"{path}.tmp"
+    torch.jit.save(frozen, tmp_path)
+    os.replace(tmp_path, path)
+    return frozen
+
+
+def load_torchscript_model(model_path=MODEL_PATH, warmup_batch_size=8):
+    """Load (exporting on first use) the frozen graph and warm it up; eager model on failure"""
+    device = torch.device('cpu')
+    try:
+        artifact = torchscript_path(model_path)
+        if artifact.exists():
+            model = torch.jit.load(str(artifact), map_location=device)
+        else:
+            eager_model, _ = load_weights(model_path, device)
+            model = export_torchscript(eager_model, artifact)
+            print(f"💾 Exported TorchScript model to {artifact}")
+        # Backend-specific rewrites do not survive serialization, so apply them after loading
+        model = torch.jit.optimize_for_inference(model)
+        warmup(model, device, warmup_batch_size)
+        return model, device
+    except Exception as e:
+        print(f"⚠️ TorchScript unavailable ({e}); falling back to eager mode")
+        model, device = load_weights(model_path, device)
+        warmup(model, device, warmup_batch_size)
+        return model, device
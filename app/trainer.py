@@ -0,0 +1,318 @@
+"""
+═══════════════════════════════════════════════════════════════
+TRAINER - Command-Line Training with Checkpoint / Resume
+═══════════════════════════════════════════════════════════════
+The notebook's BLOCK 9 loop as a script. Paths and hyperparameters
+come from a JSON config (train_config.json holds the defaults), and
+every checkpoint_every epochs the full training state is written
+to <checkpoint_dir>/last.pt:
+    model, Adam optimizer, ReduceLROnPlateau scheduler, epoch,
+    history, best accuracy, and the torch / NumPy / Python RNGs.
+
+Rerunning the same command resumes after the last checkpointed
+epoch and continues exactly as an uninterrupted run would, so a
+preempted job only loses the epoch in progress. Every epoch's
+shuffle order and augmentation come from a generator seeded with
+(seed, epoch), so they are reproducible with any number of loader
+workers. The best weights are still saved to model_path in the
+format the app loads.
+
+nproc > 1 trains data-parallel in that many local processes:
+DistributedDataParallel on the gloo backend averages gradients,
+and a DistributedSampler gives each process its own slice of every
+epoch, so throughput grows with cores until memory bandwidth runs
+out. batch_size stays the global batch; each process steps on
+batch_size / nproc. Rank 0 evaluates and writes the files, and the
+checkpoint carries every process's RNG state.
+
+precision "bf16" runs the forward pass and loss under bfloat16
+autocast (see precision_benchmark.py); weights, gradients and the
+optimizer stay fp32, so checkpoints are the same either way.
+
+Usage:
+    python app/trainer.py --config app/train_config.json
+    python app/trainer.py --config my_run.json --epochs 20    # extend a finished run
+    python app/trainer.py --config my_run.json --fresh        # ignore the checkpoint
+    python app/trainer.py --config my_run.json --nproc 4      # 4 data-parallel processes
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+import torch.optim as optim
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data.distributed import DistributedSampler
+
+from inference import AUTOCAST_DTYPES, build_model
+from training import (ChestXRayDataset, available_cores, class_weights, evaluate, make_loader, shard_datasets,
+                      test_transform, train_epoch, train_transform)
+
+CONFIG_PATH = Path(__file__).resolve().with_name('train_config.json')
+CHECKPOINT_NAME = 'last.pt'
+# Settings whose change makes a checkpoint continue a different experiment
+RUN_KEYS = ['batch_size', 'learning_rate', 'lr_factor', 'lr_patience', 'seed', 'nproc', 'precision']
+
+
+def load_config(path=None, overrides=None):
+    """Defaults from train_config.json, updated from path and then from overrides"""
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            user_config = json.load(f)
+        unknown = sorted(set(user_config) - set(config))
+        if unknown:
+            raise ValueError(f"unknown training settings in {path}: {', '.join(unknown)}")
+        config.update(user_config)
+    config.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    if not (config['train_store'] or config['train_dir']):
+        raise ValueError("set train_store or train_dir")
+    if config['nproc'] < 1 or config['batch_size'] % config['nproc']:
+        raise ValueError("batch_size must be a multiple of nproc (each process trains on batch_size / nproc)")
+    if config['precision'] not in AUTOCAST_DTYPES:
+        raise ValueError(f"precision must be one of: {', '.join(AUTOCAST_DTYPES)}")
+    return config
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def rng_state():
+    """Snapshot of every random number generator training draws from, as tensors and plain tuples"""
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    state = {
+        'torch': torch.get_rng_state(),
+        # Stored as a tensor so checkpoints load with torch.load(weights_only=True)
+        'numpy': (name, torch.from_numpy(keys.astype(np.int64)), pos, has_gauss, cached_gaussian),
+        'python': random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    name, keys, pos, has_gauss, cached_gaussian = state['numpy']
+    torch.set_rng_state(state['torch'])
+    np.random.set_state((name, keys.numpy().astype(np.uint32), pos, has_gauss, cached_gaussian))
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def save_checkpoint(path, **state):
+    """Write a checkpoint atomically so a kill mid-write never corrupts the last good one"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_weights(model, path):
+    """Save a bare state_dict, the format inference.load_weights expects"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    torch.save(model.state_dict(), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    return torch.load(path, map_location='cpu', weights_only=True)
+
+
+def build_datasets(config):
+    """(train, test) datasets from the shard stores if configured, else from the JPEG folders"""
+    if config['train_store']:
+        return shard_datasets(config['train_store'], config['test_store'])
+    test_dataset = ChestXRayDataset(config['test_dir'], transform=test_transform) if config['test_dir'] else None
+    return ChestXRayDataset(config['train_dir'], transform=train_transform), test_dataset
+
+
+def epoch_loader(dataset, config, epoch, rank=0, world_size=1):
+    """Training loader whose shuffle and augmentation depend only on (seed, epoch, rank)"""
+    generator = torch.Generator().manual_seed((config['seed'] * 100_003 + epoch) * 1_009 + rank)
+    workers = config['workers']
+    if world_size == 1:
+        # Fresh workers each epoch: persistent ones would carry augmentation RNG state the checkpoint cannot see
+        return make_loader(dataset, config['batch_size'], shuffle=True, workers=workers,
+                           generator=generator, persistent_workers=False)
+
+    # Each process sees a disjoint 1/world_size of the epoch, reshuffled per epoch from the same seed
+    sampler = DistributedSampler(dataset, num_replicas=world_size, rank=rank, shuffle=True, seed=config['seed'])
+    sampler.set_epoch(epoch)
+    if workers is None:
+        # Cores left over after one training process each, shared out between the processes
+        workers = max(0, available_cores() - world_size) // world_size
+    return make_loader(dataset, config['batch_size'] // world_size, sampler=sampler, workers=workers,
+                       generator=generator, persistent_workers=False)
+
+
+def train(config, fresh=False, rank=0, world_size=1):
+    """Train to config['epochs'], resuming from the last checkpoint unless fresh; returns the history
+
+    With world_size > 1 this runs in each of the processes started by train_distributed(), inside an
+    initialized gloo process group; rank 0 evaluates, prints and writes all files.
+    """
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    checkpoint_path = Path(config['checkpoint_dir']) / CHECKPOINT_NAME
+    distributed = world_size > 1
+    is_main = rank == 0
+    log = print if is_main else (lambda *args, **kwargs: None)
+    seed_everything(config['seed'])
+
+    train_dataset, test_dataset = build_datasets(config)
+    test_loader = None
+    if test_dataset and is_main:
+        # Its own generator: a loader without one seeds its workers from the global RNG, which a
+        # resumed run would then draw from at a different point than the original run did
+        test_loader = make_loader(test_dataset, config['batch_size'], workers=config['workers'],
+                                  generator=torch.Generator().manual_seed(config['seed']))
+    log(f"📦 {len(train_dataset)} training images"
+        + (f", {len(test_dataset)} test images" if test_dataset else ", no test set")
+        + (f" | {world_size} processes x batch {config['batch_size'] // world_size}" if distributed else ""))
+
+    model = build_model().to(device)
+    criterion = nn.CrossEntropyLoss(weight=class_weights(train_dataset.labels).to(device))
+    optimizer = optim.Adam(model.parameters(), lr=config['learning_rate'])
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='min', factor=config['lr_factor'],
+                                                     patience=config['lr_patience'])
+
+    start_epoch = 0
+    best_acc = 0.0
+    history = {'train_loss': [], 'train_acc': [], 'test_loss': [], 'test_acc': []}
+    if checkpoint_path.exists() and not fresh:
+        checkpoint = load_checkpoint(checkpoint_path)
+        changed = [k for k in RUN_KEYS if checkpoint['config'].get(k) != config[k]]
+        if changed:
+            log(f"⚠️ Resuming with changed settings ({', '.join(changed)}); the run is no longer reproducible")
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        scheduler.load_state_dict(checkpoint['scheduler'])
+        # One RNG state per process; a different process count reseeds instead
+        rng = checkpoint['rng']
+        if len(rng) == world_size:
+            set_rng_state(rng[rank])
+        else:
+            seed_everything(config['seed'] + checkpoint['epoch'] * world_size + rank)
+        start_epoch = checkpoint['epoch']
+        best_acc = checkpoint['best_acc']
+        history = checkpoint['history']
+        log(f"⏩ Resuming from {checkpoint_path} after epoch {start_epoch}")
+    elif distributed:
+        # Same initial weights everywhere (DDP also broadcasts rank 0's), different dropout masks per process
+        seed_everything(config['seed'] + rank)
+
+    bare_model = model
+    if distributed:
+        model = DistributedDataParallel(model)
+
+    start_time = time.time()
+    for epoch in range(start_epoch, config['epochs']):
+        log(f"\n📊 EPOCH {epoch + 1}/{config['epochs']} (lr {optimizer.param_groups[0]['lr']:g})")
+        epoch_start = time.perf_counter()
+        train_loss, train_acc = train_epoch(model, epoch_loader(train_dataset, config, epoch, rank, world_size),
+                                            criterion, optimizer, device, config['precision'], progress=is_main)
+        images_per_sec = len(train_dataset) / (time.perf_counter() - epoch_start)
+        if test_loader is not None:
+            test_loss, test_acc, _, _ = evaluate(bare_model, test_loader, criterion, device,
+                                               config['precision'])
+        else:
+            test_loss, test_acc = train_loss, train_acc
+        if distributed:
+            # Mean training metrics over processes; every scheduler must step on rank 0's test loss
+            train_metrics = torch.tensor([train_loss, train_acc], dtype=torch.float64)
+            dist.all_reduce(train_metrics)
+            train_loss, train_acc = (train_metrics / world_size).tolist()
+            test_metrics = torch.tensor([test_loss, test_acc], dtype=torch.float64)
+            dist.broadcast(test_metrics, src=0)
+            test_loss, test_acc = test_metrics.tolist()
+        scheduler.step(test_loss)
+
+        history['train_loss'].append(train_loss)
+        history['train_acc'].append(train_acc)
+        history['test_loss'].append(test_loss)
+        history['test_acc'].append(test_acc)
+        log(f"   Train Loss: {train_loss:.4f} | Train Acc: {train_acc:.2f}% | ⚡ {images_per_sec:.1f} images/s")
+        log(f"   Test Loss:  {test_loss:.4f} | Test Acc:  {test_acc:.2f}%")
+
+        if test_acc > best_acc:
+            best_acc = test_acc
+            if is_main:
+                save_weights(bare_model, config['model_path'])
+            log(f"   💾 New best model saved to {config['model_path']} (Test Acc: {best_acc:.2f}%)")
+
+        done = epoch + 1
+        if done % config['checkpoint_every'] == 0 or done == config['epochs']:
+            rng = [rng_state()]
+            if distributed:
+                rng = [None] * world_size
+                dist.all_gather_object(rng, rng_state())
+            if is_main:
+                save_checkpoint(checkpoint_path, epoch=done, model=bare_model.state_dict(),
+                                optimizer=optimizer.state_dict(), scheduler=scheduler.state_dict(), rng=rng,
+                                best_acc=best_acc, history=history, config=config)
+            log(f"   💾 Checkpoint: epoch {done} -> {checkpoint_path}")
+
+    elapsed = time.time() - start_time
+    log(f"\n🎉 Trained to epoch {config['epochs']} in {int(elapsed // 60)} min {int(elapsed % 60)} sec "
+        f"| 🏆 best test accuracy {best_acc:.2f}%")
+    return history
+
+
+def _distributed_worker(rank, world_size, port, config, fresh):
+    # Split the cores between the processes instead of every process using all of them
+    torch.set_num_threads(max(1, available_cores() // world_size))
+    dist.init_process_group('gloo', init_method=f'tcp://127.0.0.1:{port}', rank=rank, world_size=world_size)
+    try:
+        train(config, fresh, rank, world_size)
+    finally:
+        dist.destroy_process_group()
+
+
+def train_distributed(config, fresh=False):
+    """Run train() in config['nproc'] local processes with DistributedDataParallel on gloo"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    mp.spawn(_distributed_worker, args=(config['nproc'], port, config, fresh), nprocs=config['nproc'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the pneumonia classifier with checkpoint/resume")
+    parser.add_argument('--config', help="JSON settings file (keys as in app/train_config.json)")
+    parser.add_argument('--epochs', type=int, help="Override the number of epochs")
+    parser.add_argument('--workers', type=int, help="Override the loader worker count")
+    parser.add_argument('--checkpoint-dir', help="Override where last.pt is written")
+    parser.add_argument('--nproc', type=int, help="Override the number of data-parallel training processes")
+    parser.add_argument('--precision', choices=list(AUTOCAST_DTYPES), help="Override the compute precision")
+    parser.add_argument('--fresh', action='store_true', help="Start from epoch 1 even if a checkpoint exists")
+    args = parser.parse_args()
+
+    config = load_config(args.config, {'epochs': args.epochs, 'workers': args.workers,
+                                       'checkpoint_dir': args.checkpoint_dir, 'nproc': args.nproc,
+                                       'precision': args.precision})
+    print("📋 " + json.dumps(config))
+    if config['nproc'] > 1:
+        train_distributed(config, fresh=args.fresh)
+    else:
+        train(config, fresh=args.fresh)
+
+
+if __name__ == "__main__":
+    main()
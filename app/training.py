@@ -0,0 +1,279 @@
+"""
+═══════════════════════════════════════════════════════════════
+TRAINING - Datasets, Loaders and the Train / Evaluate Loop
+═══════════════════════════════════════════════════════════════
+The training code from 02_pneumonia_model_CLEAN.ipynb as an
+importable module. Everything a DataLoader worker has to unpickle
+(datasets, transforms, collate functions) lives at module level,
+so multi-process loading works the same from a script, a notebook
+or a spawned worker. The notebook's num_workers=0 was only needed
+because its Dataset class was defined inside the notebook.
+
+make_loader() sizes the worker count from the cores this process
+may use, with a fixed prefetch depth of four batches per worker,
+persistent workers and pinned memory when a GPU is present.
+
+Run this file to measure loader throughput against the model's
+training speed on the same machine:
+    python app/training.py data/chest_xray/train --store data/shards/train
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision import transforms
+
+from batch_score import IMAGE_EXTENSIONS
+from inference import autocast, build_model, normalize_gray_batch
+from shard_store import TRAIN_AUGMENT, ShardDataset
+
+# Notebook transforms for the JPEG path (BLOCK 4)
+train_transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.RandomHorizontalFlip(p=0.5),
+    transforms.RandomRotation(10),
+    transforms.ColorJitter(brightness=0.2, contrast=0.2),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+test_transform = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
+# Upper bound on loader workers; beyond this they mostly contend for the same cores as the model
+MAX_WORKERS = 8
+
+
+class ChestXRayDataset(Dataset):
+    """Images from NORMAL (label 0) and PNEUMONIA (label 1) subfolders, decoded on every access"""
+
+    def __init__(self, root_dir, transform=None):
+        """
+        Args:
+            root_dir (Path): Directory with NORMAL and PNEUMONIA subfolders
+            transform (callable): Optional transforms to apply to images
+        """
+        self.root_dir = Path(root_dir)
+        self.transform = transform
+        self.image_paths = []
+        self.labels = []
+        for label, folder in enumerate(['NORMAL', 'PNEUMONIA']):
+            folder_path = self.root_dir / folder
+            if not folder_path.is_dir():
+                continue
+            # Same extensions as shard_store ingest and batch_score, so every path sees the same images
+            for img_path in sorted(folder_path.iterdir()):
+                if img_path.suffix.lower() in IMAGE_EXTENSIONS and img_path.is_file():
+                    self.image_paths.append(img_path)
+                    self.labels.append(label)
+
+    def __len__(self):
+        return len(self.image_paths)
+
+    def __getitem__(self, idx):
+        image = Image.open(self.image_paths[idx]).convert('RGB')
+        if self.transform:
+            image = self.transform(image)
+        return image, self.labels[idx]
+
+
+def collate_gray(batch):
+    """Collate (1, H, W) uint8 shard items into a normalized (N, 3, H, W) batch and a label tensor"""
+    images, labels = zip(*batch)
+    return normalize_gray_batch(torch.cat(images)), torch.tensor(labels)
+
+
+def shard_datasets(train_store, test_store=None):
+    """(train, test) ShardDatasets: augmented training items, plain test items"""
+    train_dataset = ShardDataset(train_store, transform=TRAIN_AUGMENT)
+    test_dataset = ShardDataset(test_store) if test_store else None
+    return train_dataset, test_dataset
+
+
+def available_cores():
+    """CPU cores this process may run on (respects affinity masks and container CPU sets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def loader_settings(workers=None):
+    """DataLoader keyword arguments sized for this machine"""
+    if workers is None:
+        # One core stays with the training process itself
+        workers = min(MAX_WORKERS, available_cores() - 1)
+    settings = {'num_workers': max(0, workers), 'pin_memory': torch.cuda.is_available()}
+    if settings['num_workers']:
+        # Two batches queued per worker by default; four keeps augmentation ahead of short steps
+        settings['prefetch_factor'] = 4
+        settings['persistent_workers'] = True
+    return settings
+
+
+def make_loader(dataset, batch_size=32, shuffle=False, workers=None, **kwargs):
+    """DataLoader for a training dataset; shard datasets get collate_gray automatically"""
+    if isinstance(dataset, ShardDataset):
+        kwargs.setdefault('collate_fn', collate_gray)
+    # Explicit keyword arguments win over the machine-sized defaults
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, **{**loader_settings(workers), **kwargs})
+
+
+def class_weights(labels):
+    """Inverse-frequency CrossEntropyLoss weights for the two classes, as in the notebook"""
+    total = len(labels)
+    return torch.FloatTensor([total / (2 * labels.count(0)), total / (2 * labels.count(1))])
+
+
+def _progress(iterable, desc, disable=False):
+    # tqdm is a notebook nicety, not a requirement
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return iterable
+    return tqdm(iterable, desc=desc, disable=disable)
+
+
+def train_epoch(model, train_loader, criterion, optimizer, device, precision='fp32', progress=True):
+    """Train model for one epoch; precision 'bf16' runs the forward pass and loss under autocast"""
+    model.train()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+
+    pbar = _progress(train_loader, 'Training', disable=not progress)
+    for images, labels in pbar:
+        images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+
+        optimizer.zero_grad()
+        # bf16 keeps fp32's exponent range, so unlike fp16 it needs no gradient scaling
+        with autocast(device, precision):
+            outputs = model(images)
+            loss = criterion(outputs, labels)
+        loss.backward()
+        optimizer.step()
+
+        running_loss += loss.item()
+        _, predicted = torch.max(outputs.data, 1)
+        total += labels.size(0)
+        correct += (predicted == labels).sum().item()
+
+        if hasattr(pbar, 'set_postfix'):
+            pbar.set_postfix({'loss': f'{running_loss/total:.4f}', 'acc': f'{100*correct/total:.2f}%'})
+
+    epoch_loss = running_loss / len(train_loader)
+    epoch_acc = 100 * correct / total
+    return epoch_loss, epoch_acc
+
+
+def evaluate(model, test_loader, criterion, device, precision='fp32'):
+    """Evaluate model on test set"""
+    model.eval()
+    running_loss = 0.0
+    correct = 0
+    total = 0
+
+    all_labels = []
+    all_predictions = []
+
+    with torch.no_grad():
+        for images, labels in _progress(test_loader, 'Evaluating'):
+            images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+
+            with autocast(device, precision):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
+
+            running_loss += loss.item()
+            _, predicted = torch.max(outputs.data, 1)
+            total += labels.size(0)
+            correct += (predicted == labels).sum().item()
+
+            all_labels.extend(labels.cpu().numpy())
+            all_predictions.extend(predicted.cpu().numpy())
+
+    epoch_loss = running_loss / len(test_loader)
+    epoch_acc = 100 * correct / total
+
+    return epoch_loss, epoch_acc, all_labels, all_predictions
+
+
+def loader_throughput(loader, max_images=1024):
+    """Images/sec drawn from a loader, timed after its first batch so worker startup is excluded"""
+    iterator = iter(loader)
+    next(iterator)
+    count = 0
+    start = time.perf_counter()
+    for images, _ in iterator:
+        count += len(images)
+        if count >= max_images:
+            break
+    return count / (time.perf_counter() - start)
+
+
+def training_throughput(batch_size=32, steps=5, precision='fp32'):
+    """Images/sec of forward + backward + Adam steps on random batches, i.e. what the model can consume"""
+    model = build_model()
+    model.train()
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    criterion = nn.CrossEntropyLoss()
+    images = torch.randn(batch_size, 3, 224, 224)
+    labels = torch.randint(0, 2, (batch_size,))
+
+    def step():
+        optimizer.zero_grad()
+        with autocast(images.device, precision):
+            loss = criterion(model(images), labels)
+        loss.backward()
+        optimizer.step()
+
+    step()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return steps * batch_size / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure training data loader throughput in images/sec")
+    parser.add_argument('image_dir', help="Training directory with NORMAL and PNEUMONIA subfolders")
+    parser.add_argument('--store', help="Shard store of the same images (see shard_store.py)")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=None, help="Loader workers (default: from available cores)")
+    parser.add_argument('--images', type=int, default=512, help="Images drawn per loader")
+    args = parser.parse_args()
+
+    settings = loader_settings(args.workers)
+    print(f"🖥️  {available_cores()} cores available | loader: {settings['num_workers']} workers, "
+          f"prefetch {settings.get('prefetch_factor', '-')}, "
+          f"persistent {settings.get('persistent_workers', False)}, pin_memory {settings['pin_memory']}")
+
+    results = {}
+    jpeg_dataset = ChestXRayDataset(args.image_dir, transform=train_transform)
+    notebook_loader = DataLoader(jpeg_dataset, batch_size=args.batch_size, shuffle=True, num_workers=0)
+    results['notebook (JPEG, 0 workers)'] = loader_throughput(notebook_loader, args.images)
+    jpeg_loader = make_loader(jpeg_dataset, args.batch_size, shuffle=True, workers=args.workers)
+    results[f'JPEG, {settings["num_workers"]} workers'] = loader_throughput(jpeg_loader, args.images)
+    if args.store:
+        train_dataset, _ = shard_datasets(args.store)
+        shard_loader = make_loader(train_dataset, args.batch_size, shuffle=True, workers=args.workers)
+        results[f'shards, {settings["num_workers"]} workers'] = loader_throughput(shard_loader, args.images)
+
+    model_rate = training_throughput(args.batch_size)
+    print(f"🧠 Model training step: {model_rate:8.1f} images/s")
+    for name, rate in results.items():
+        verdict = "keeps up" if rate >= model_rate else "starves the model"
+        print(f"📦 {name:<28} {rate:8.1f} images/s ({rate / model_rate:.1f}x the model, {verdict})")
+
+
+if __name__ == "__main__":
+    main()
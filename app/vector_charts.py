@@ -0,0 +1,149 @@
+"""
+═══════════════════════════════════════════════════════════════
+VECTOR CHARTS - Native ReportLab Risk Gauge and Symptom Charts
+═══════════════════════════════════════════════════════════════
+The report charts drawn with reportlab.graphics primitives instead
+of matplotlib PNGs. The drawings are flowables, so they go into the
+PDF as a handful of vector paths and text runs: nothing is
+rasterized, and they stay sharp at any zoom. Layout and colors
+follow the matplotlib versions in medical_report.py.
+
+Run this file to compare report build time and file size:
+    python app/vector_charts.py --reports 20
+═══════════════════════════════════════════════════════════════
+"""
+
+import argparse
+import time
+
+from reportlab.graphics.shapes import Circle, Drawing, Line, PolyLine, Rect, String
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+BAND_COLORS = ['#81c784', '#fff59d', '#ef9a9a']
+BAND_BOUNDS = [0, 30, 60, 100]
+BAND_LABELS = [('LOW', '0-30', '#1b5e20'), ('MEDIUM', '30-60', '#f57f17'), ('HIGH', '60-100', '#b71c1c')]
+SYMPTOM_LABELS = [['Fever'], ['Cough'], ['Dyspnea'], ['Smoking', 'History'], ['Chronic', 'Disease']]
+
+
+def risk_gauge_drawing(risk_score, risk_category, width=6*inch, height=3*inch):
+    """Vector version of create_risk_gauge_chart, sized like its RLImage in the report"""
+    drawing = Drawing(width, height)
+    # Centered in the frame like the RLImage it replaces
+    drawing.hAlign = 'CENTER'
+    margin = 8
+    # Same data space as the matplotlib axes: x in [0, 100], y in [-1, 1.5]
+    def x(value):
+        return margin + value * (width - 2 * margin) / 100
+    def y(value):
+        return (value + 1) * height / 2.5
+
+    # Gauge bands
+    for (left, right), color in zip(zip(BAND_BOUNDS, BAND_BOUNDS[1:]), BAND_COLORS):
+        drawing.add(Rect(x(left), y(-0.15), x(right) - x(left), y(0.15) - y(-0.15),
+                         fillColor=colors.HexColor(color), fillOpacity=0.7,
+                         strokeColor=colors.white, strokeWidth=1.5))
+
+    # Risk pointer
+    drawing.add(Line(x(risk_score), y(-0.2), x(risk_score), y(0.5), strokeColor=colors.black, strokeWidth=3))
+    drawing.add(Circle(x(risk_score), y(0.5), 5.5, fillColor=colors.black, strokeColor=None))
+
+    # Band labels
+    for (name, span, color), center in zip(BAND_LABELS, [15, 45, 80]):
+        for line_no, text in enumerate([name, span]):
+            drawing.add(String(x(center), y(-0.42) - 11 * line_no, text, textAnchor='middle',
+                               fontName='Helvetica-Bold', fontSize=9, fillColor=colors.HexColor(color)))
+
+    # Risk score text
+    drawing.add(String(x(risk_score), y(0.8), f'{risk_score}', textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=18, fillColor=colors.HexColor('#0d47a1')))
+    drawing.add(String(x(risk_score), y(1.2), f'{risk_category} RISK', textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=10.5, fillColor=colors.HexColor('#1565c0')))
+    return drawing
+
+
+def _mark(drawing, cx, cy, present, color):
+    """Check mark or cross drawn as strokes, since the base-14 PDF fonts lack ✓ and ✗"""
+    if present:
+        points = [cx - 4, cy, cx - 1.5, cy - 3.5, cx + 4, cy + 4]
+    else:
+        drawing.add(Line(cx - 3.5, cy - 3.5, cx + 3.5, cy + 3.5, strokeColor=color, strokeWidth=1.8))
+        points = [cx - 3.5, cy + 3.5, cx + 3.5, cy - 3.5]
+    drawing.add(PolyLine(points, strokeColor=color, strokeWidth=1.8))
+
+
+def symptoms_drawing(has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition,
+                     width=6*inch, height=3.5*inch):
+    """Vector version of create_symptoms_chart, sized like its RLImage in the report"""
+    drawing = Drawing(width, height)
+    drawing.hAlign = 'CENTER'
+    values = [has_fever, has_cough, has_breathing_difficulty, is_smoker, has_chronic_condition]
+
+    left, right = 62, width - 4
+    bottom, top = 30, height - 30
+    row = (top - bottom) / len(values)
+    bar = row * 0.8
+
+    drawing.add(String((left + right) / 2, height - 16, 'Symptom Profile', textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=12, fillColor=colors.HexColor('#0d47a1')))
+    drawing.add(String((left + right) / 2, 8, 'Clinical Indicators', textAnchor='middle',
+                       fontName='Helvetica-Bold', fontSize=9, fillColor=colors.black))
+
+    # Fever on the bottom row, as in the matplotlib barh
+    for i, (label_lines, value) in enumerate(zip(SYMPTOM_LABELS, values)):
+        center = bottom + (i + 0.5) * row
+        drawing.add(Rect(left, center - bar / 2, right - left, bar, strokeColor=colors.white, strokeWidth=1.5,
+                         fillColor=colors.HexColor('#ef5350' if value else '#e0e0e0')))
+
+        first = center + 4 * (len(label_lines) - 1) - 3
+        for line_no, text in enumerate(label_lines):
+            drawing.add(String(left - 8, first - 9 * line_no, text, textAnchor='end',
+                               fontName='Helvetica', fontSize=8, fillColor=colors.black))
+        drawing.add(Line(left - 5, center, left - 2, center, strokeColor=colors.black, strokeWidth=0.6))
+
+        text_color = colors.white if value else colors.HexColor('#757575')
+        label = 'PRESENT' if value else 'ABSENT'
+        drawing.add(String((left + right) / 2 + 6, center - 4, label, textAnchor='middle',
+                           fontName='Helvetica-Bold', fontSize=10.5, fillColor=text_color))
+        _mark(drawing, (left + right) / 2 - 28 if value else (left + right) / 2 - 26, center, value, text_color)
+    return drawing
+
+
+def _benchmark(vector_charts, scores):
+    """Mean build time (ms) and PDF size (bytes) over one report per risk score"""
+    from medical_report import generate_pdf_report
+
+    elapsed = 0.0
+    sizes = []
+    for i, risk_score in enumerate(scores):
+        risk_category = 'LOW' if risk_score < 30 else 'MEDIUM' if risk_score < 60 else 'HIGH'
+        flags = [bool(i >> bit & 1) for bit in range(5)]
+        start = time.perf_counter()
+        buffer = generate_pdf_report('Benchmark Patient', 50, 'Female', *flags, 5, risk_score, risk_category,
+                                     'Pneumonia', 91.3, None, vector_charts=vector_charts)
+        elapsed += time.perf_counter() - start
+        sizes.append(len(buffer.getvalue()))
+    return 1000 * elapsed / len(scores), sum(sizes) / len(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector and matplotlib chart rendering in the PDF report")
+    parser.add_argument('--reports', type=int, default=20, help="Reports built per path")
+    args = parser.parse_args()
+
+    # Distinct scores so the first matplotlib pass renders every chart instead of hitting chart_cache
+    scores = [(i * 37) % 101 for i in range(args.reports)]
+    png_cold = _benchmark(False, scores)
+    png_cached = _benchmark(False, scores)
+    vector = _benchmark(True, scores)
+
+    print(f"📄 {args.reports} reports per path")
+    print(f"   matplotlib PNG, rendered:  {png_cold[0]:7.1f} ms/report | {png_cold[1] / 1024:6.1f} KiB")
+    print(f"   matplotlib PNG, cached:    {png_cached[0]:7.1f} ms/report | {png_cached[1] / 1024:6.1f} KiB")
+    print(f"   reportlab vector:          {vector[0]:7.1f} ms/report | {vector[1] / 1024:6.1f} KiB")
+    print(f"🚀 Vector vs rendered PNG: {png_cold[0] / vector[0]:.1f}x faster, "
+          f"{png_cold[1] / vector[1]:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()